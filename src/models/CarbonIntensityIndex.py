@@ -0,0 +1,67 @@
+import heapq
+import numpy as np
+
+
+class CarbonIntensityIndex:
+    # sparse table over the ranks of carbon intensity values, answers range minimum and k lowest queries without scanning the range
+    # ties rank by position so the earliest interval is the lower one, missing (nan) values rank highest
+    __slots__ = ("_values", "_ranks", "_table")
+
+    def __init__(self, values):
+        self._values = np.asarray(values, dtype=np.float64)
+        self._ranks = np.empty(len(self._values), dtype=np.int64)
+        self._ranks[np.argsort(self._values, kind="stable")] = np.arange(len(self._values))
+
+        # table[j][i] is the position of the lowest rank in [i, i + 2^j)
+        self._table = [np.arange(len(self._values), dtype=np.int64)]
+        width = 1
+
+        while 2 * width <= len(self._values):
+            previous = self._table[-1]
+            left = previous[:len(previous) - width]
+            right = previous[width:]
+            self._table.append(np.where(self._ranks[left] <= self._ranks[right], left, right))
+            width *= 2
+
+    def __len__(self):
+        return len(self._values)
+
+    def get_values(self):
+        return self._values
+
+    def get_min_index(self, start, end):
+        # position of the lowest value in [start, end)
+        if start < 0 or end > len(self._values) or start >= end:
+            raise IndexError((start, end))
+
+        level = int(end - start).bit_length() - 1
+        left = self._table[level][start]
+        right = self._table[level][end - (1 << level)]
+        return int(left if self._ranks[left] <= self._ranks[right] else right)
+
+    def get_lowest(self, start, end, k):
+        # positions of the k lowest values in [start, end) in chronological order, O(k log k) regardless of the range
+        if k > end - start:
+            raise ValueError(f"{k} lowest requested from a range of {end - start}")
+
+        lowest = []
+        candidates = []
+
+        if k > 0:
+            i = self.get_min_index(start, end)
+            candidates.append((self._ranks[i], i, start, end))
+
+        while len(lowest) < k:
+            (_, i, lo, hi) = heapq.heappop(candidates)
+            lowest.append(i)
+
+            # the next lowest is the minimum of one of the ranges either side of a value already taken
+            for (sub_lo, sub_hi) in [(lo, i), (i + 1, hi)]:
+                if sub_lo < sub_hi:
+                    j = self.get_min_index(sub_lo, sub_hi)
+                    heapq.heappush(candidates, (self._ranks[j], j, sub_lo, sub_hi))
+
+        return np.sort(np.array(lowest, dtype=np.int64))
+
+    def __str__(self):
+        return f"[CarbonIntensityIndex: intervals={len(self._values)}, levels={len(self._table)}]"
@@ -0,0 +1,91 @@
+import numpy as np
+
+
+class CarbonIntensitySeries:
+    # carbon intensity at a fixed step from a start epoch (ms), value i covers [start + i * step, start + (i + 1) * step)
+    __slots__ = ("_start", "_step", "_values")
+
+    def __init__(self, start, step, values):
+        self._start = int(start)
+        self._step = int(step)
+        self._values = np.asarray(values, dtype=np.float64)
+
+    def __len__(self):
+        return len(self._values)
+
+    def get_start(self):
+        return self._start
+
+    def get_step(self):
+        return self._step
+
+    def get_end(self):
+        return self._start + len(self._values) * self._step
+
+    def get_values(self):
+        return self._values
+
+    def get_timestamps(self):
+        return self._start + np.arange(len(self._values), dtype=np.int64) * self._step
+
+    def get_index(self, timestamp):
+        return (int(timestamp) - self._start) // self._step
+
+    def contains(self, timestamp):
+        index = self.get_index(timestamp)
+        return 0 <= index < len(self._values) and not np.isnan(self._values[index])
+
+    def get_value(self, timestamp):
+        if not self.contains(timestamp):
+            raise KeyError(timestamp)
+
+        return float(self._values[self.get_index(timestamp)])
+
+    def get_values_at(self, timestamps, strict=True):
+        # strict lookups raise KeyError for missing data, otherwise missing data is returned as nan
+        indices = (np.asarray(timestamps, dtype=np.int64) - self._start) // self._step
+        outside = (indices < 0) | (indices >= len(self._values))
+
+        if strict and outside.any():
+            raise KeyError("timestamps outside of the carbon intensity series")
+
+        if len(self._values) == 0:
+            values = np.full(len(indices), np.nan)
+        else:
+            values = np.where(outside, np.nan, self._values[np.clip(indices, 0, len(self._values) - 1)])
+
+        if strict and np.isnan(values).any():
+            raise KeyError("timestamps without carbon intensity data")
+
+        return values
+
+    def get_range(self, start, end):
+        # intervals overlapping [start, end), the values are a view so no data is copied
+        first = max(self.get_index(start), 0)
+        last = min(-((self._start - int(end)) // self._step), len(self._values))
+        last = max(first, last)
+
+        return CarbonIntensitySeries(self._start + first * self._step, self._step, self._values[first:last])
+
+    def __str__(self):
+        return f"[CarbonIntensitySeries: start={self._start}, step={self._step}, intervals={len(self._values)}]"
+
+
+def make_carbon_intensity_series(timestamps, values, step=None):
+    # timestamps (ms) need not be sorted or complete, missing intervals are left as nan
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+
+    if len(timestamps) == 0:
+        return CarbonIntensitySeries(0, step or 1, values)
+
+    if step is None:
+        gaps = np.diff(np.unique(timestamps))
+        step = int(gaps.min()) if len(gaps) > 0 else 30 * 60 * 1000
+
+    start = int(timestamps.min())
+    indices = (timestamps - start) // step
+    series = np.full(int(indices.max()) + 1, np.nan)
+    series[indices] = values  # a repeated interval keeps its last value
+
+    return CarbonIntensitySeries(start, step, series)
@@ -1,6 +1,9 @@
 HEADERS = "name,co2e,energy,avg_ci,realtime,cpu_model,cpu_count,cpu_powerdraw,cpu_usage,memory,memory_powerdraw"
 
 class CarbonRecord:
+    __slots__ = ("_energy", "_co2e", "_realtime", "_start", "_complete", "_core_count", "_core_powerdraw",
+                 "_cpu_usage", "_cpu_model", "_memory", "_name", "_avg_ci", "_memory_powerdraw")
+
     def __init__(self, energy, co2e, realtime, start, complete, core_count, 
                  core_powerdraw, cpu_usage, cpu_model, memory, name):
         self._energy = energy
@@ -22,6 +25,7 @@ class CarbonRecord:
         self._name = name
 
         self._avg_ci = None
+        self._memory_powerdraw = None
 
     def get_realtime(self):
         return self._realtime
@@ -77,11 +81,14 @@ class CarbonRecord:
     def set_co2e(self, co2e):
         self._co2e = co2e
 
+    def get_name(self):
+        return self._name
+
+    def get_avg_ci(self):
+        return self._avg_ci
+
     def set_avg_ci(self, ci):
         self._avg_ci = ci
 
     def __str__(self):
-        if not hasattr(self, '_memory_powerdraw'):
-            self._memory_powerdraw = None
-
         return f"{self._name},{self._co2e},{self._energy},{self._avg_ci},{self._realtime},{self._cpu_model},{self._core_count},{self._core_powerdraw},{self._cpu_usage},{self._memory},{self._memory_powerdraw}"
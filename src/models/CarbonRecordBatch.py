@@ -0,0 +1,202 @@
+from array import array
+import numpy as np
+
+
+class CarbonRecordBatch:
+    # struct-of-arrays storage for many carbon records, rows are read through CarbonRecordRow
+    def __init__(self, realtime, start, complete, core_count, cpu_usage, memory, cpu_model, name):
+        self._realtime = np.asarray(realtime, dtype=np.float64)
+        self._start = np.asarray(start, dtype=np.int64)
+        self._complete = np.asarray(complete, dtype=np.int64)
+        self._core_count = np.asarray(core_count, dtype=np.int64)
+        self._cpu_usage = np.asarray(cpu_usage, dtype=np.float64)
+        self._memory = np.asarray(memory, dtype=np.float64)
+        self._cpu_model = cpu_model if isinstance(cpu_model, list) else list(cpu_model)
+        self._name = name if isinstance(name, list) else list(name)
+
+        # outputs, nan until the footprint has been calculated
+        size = len(self._realtime)
+        self._energy = np.full(size, np.nan)
+        self._co2e = np.full(size, np.nan)
+        self._avg_ci = np.full(size, np.nan)
+        self._core_powerdraw = np.full(size, np.nan)
+        self._memory_powerdraw = np.full(size, np.nan)
+
+    def __len__(self):
+        return len(self._realtime)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+
+        if i < 0 or i >= len(self):
+            raise IndexError(i)
+
+        return CarbonRecordRow(self, i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield CarbonRecordRow(self, i)
+
+    def get_realtimes(self):
+        return self._realtime
+
+    def get_starts(self):
+        return self._start
+
+    def get_completes(self):
+        return self._complete
+
+    def get_core_counts(self):
+        return self._core_count
+
+    def get_cpu_usages(self):
+        return self._cpu_usage
+
+    def get_memories(self):
+        return self._memory
+
+    def get_energies(self):
+        return self._energy
+
+    def get_co2es(self):
+        return self._co2e
+
+    def get_avg_cis(self):
+        return self._avg_ci
+
+    def shift(self, offset):
+        # same tasks moved in time by offset (ms), only start and complete are copied
+        return CarbonRecordBatch(self._realtime, self._start + int(offset), self._complete + int(offset), self._core_count,
+                                 self._cpu_usage, self._memory, self._cpu_model, self._name)
+
+    def set_footprints(self, energy, co2e, avg_ci):
+        self._energy[:] = energy
+        self._co2e[:] = co2e
+        self._avg_ci[:] = avg_ci
+
+
+def to_optional(value):
+    return None if np.isnan(value) else float(value)
+
+
+class CarbonRecordRow:
+    # same getters and setters as CarbonRecord, reading and writing one row of a CarbonRecordBatch
+    __slots__ = ("_batch", "_i")
+
+    def __init__(self, batch: CarbonRecordBatch, i):
+        self._batch = batch
+        self._i = i
+
+    def get_realtime(self):
+        return float(self._batch._realtime[self._i])
+
+    def set_realtime(self, realtime):
+        self._batch._realtime[self._i] = realtime
+
+    def get_core_count(self):
+        return int(self._batch._core_count[self._i])
+
+    def get_start(self):
+        return int(self._batch._start[self._i])
+
+    def set_start(self, start):
+        self._batch._start[self._i] = start
+
+    def get_complete(self):
+        return int(self._batch._complete[self._i])
+
+    def set_complete(self, complete):
+        self._batch._complete[self._i] = complete
+
+    def get_cpu_powerdraw(self):
+        return to_optional(self._batch._core_powerdraw[self._i])
+
+    def set_cpu_powerdraw(self, core_powerdraw):
+        self._batch._core_powerdraw[self._i] = np.nan if core_powerdraw is None else core_powerdraw
+
+    def get_cpu_usage(self):
+        return float(self._batch._cpu_usage[self._i])
+
+    def get_memory(self):
+        return float(self._batch._memory[self._i])
+
+    def get_memory_powerdraw(self):
+        return to_optional(self._batch._memory_powerdraw[self._i])
+
+    def set_memory_powerdraw(self, memory_powerdraw):
+        self._batch._memory_powerdraw[self._i] = np.nan if memory_powerdraw is None else memory_powerdraw
+
+    def get_energy(self):
+        return to_optional(self._batch._energy[self._i])
+
+    def get_co2e(self):
+        return to_optional(self._batch._co2e[self._i])
+
+    def get_cpu_model(self):
+        return self._batch._cpu_model[self._i]
+
+    def get_name(self):
+        return self._batch._name[self._i]
+
+    def set_energy(self, energy):
+        self._batch._energy[self._i] = energy
+
+    def set_co2e(self, co2e):
+        self._batch._co2e[self._i] = co2e
+
+    def get_avg_ci(self):
+        return to_optional(self._batch._avg_ci[self._i])
+
+    def set_avg_ci(self, ci):
+        self._batch._avg_ci[self._i] = ci
+
+    def __str__(self):
+        return f"{self.get_name()},{self.get_co2e()},{self.get_energy()},{self.get_avg_ci()},{self.get_realtime()},{self.get_cpu_model()},{self.get_core_count()},{self.get_cpu_powerdraw()},{self.get_cpu_usage()},{self.get_memory()},{self.get_memory_powerdraw()}"
+
+
+def make_carbon_record_batch(records):
+    # records are TraceRecords, typed arrays keep the columns compact while they are read
+    realtime = array('d')
+    start = array('q')
+    complete = array('q')
+    core_count = array('q')
+    cpu_usage = array('d')
+    memory = array('d')
+    cpu_model = []
+    name = []
+
+    for record in records:
+        realtime.append(record.get_realtime())
+        start.append(int(record.get_start()))
+        complete.append(int(record.get_complete()))
+        core_count.append(record.get_cpu_count())
+        cpu_usage.append(record.parse_cpu_percentage())
+        memory.append(record.parse_memory())
+        cpu_model.append(record.get_cpu_model())
+        name.append(record.get_name())
+
+    return CarbonRecordBatch(np.frombuffer(realtime, dtype=np.float64), np.frombuffer(start, dtype=np.int64),
+                             np.frombuffer(complete, dtype=np.int64), np.frombuffer(core_count, dtype=np.int64),
+                             np.frombuffer(cpu_usage, dtype=np.float64), np.frombuffer(memory, dtype=np.float64),
+                             cpu_model, name)
+
+
+def save_carbon_record_batch(batch: CarbonRecordBatch, file, **metadata):
+    # text columns are stored as fixed width strings, cpu_model also keeps which rows were None
+    cpu_model_none = np.array([model is None for model in batch._cpu_model], dtype=bool)
+    cpu_model = np.array(["" if model is None else model for model in batch._cpu_model], dtype=str)
+    np.savez(file, realtime=batch._realtime, start=batch._start, complete=batch._complete,
+             core_count=batch._core_count, cpu_usage=batch._cpu_usage, memory=batch._memory,
+             cpu_model=cpu_model, cpu_model_none=cpu_model_none, name=np.array(batch._name, dtype=str),
+             **{key: np.array(value) for (key, value) in metadata.items()})
+
+
+def load_carbon_record_batch(file):
+    with np.load(file, allow_pickle=False) as data:
+        metadata = {key: data[key].item() for key in data.files if data[key].ndim == 0}
+        cpu_model = [None if none else model for (model, none) in zip(data["cpu_model"].tolist(), data["cpu_model_none"].tolist())]
+        batch = CarbonRecordBatch(data["realtime"], data["start"], data["complete"], data["core_count"],
+                                  data["cpu_usage"], data["memory"], cpu_model, data["name"].tolist())
+
+    return (batch, metadata)
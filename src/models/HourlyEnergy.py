@@ -0,0 +1,52 @@
+import numpy as np
+
+
+class HourlyEnergy:
+    # running energy per epoch hour (energy, energy inc. pue, memory, memory inc. pue in kWh), hours only grow as fragments are added
+    __slots__ = ("_step", "_energy", "_counts")
+
+    COLUMNS = 4
+
+    def __init__(self, step):
+        self._step = int(step)
+        self._energy = {}
+        self._counts = {}
+
+    def __len__(self):
+        return len(self._energy)
+
+    def add(self, indices, energy):
+        # indices are epoch hour indices of each fragment, energy has one row of COLUMNS per fragment
+        indices = np.asarray(indices, dtype=np.int64)
+        energy = np.asarray(energy, dtype=np.float64).reshape(-1, self.COLUMNS)
+        (hours, inverse) = np.unique(indices, return_inverse=True)
+        sums = np.column_stack([np.bincount(inverse, weights=energy[:, j], minlength=len(hours)) for j in range(self.COLUMNS)])
+        counts = np.bincount(inverse, minlength=len(hours))
+
+        for (hour, hour_energy, count) in zip(hours.tolist(), sums, counts.tolist()):
+            if hour in self._energy:
+                self._energy[hour] += hour_energy
+                self._counts[hour] += count
+            else:
+                self._energy[hour] = hour_energy
+                self._counts[hour] = count
+
+        return hours * self._step  # the hours (ms) that changed
+
+    def get_hours(self):
+        return [hour * self._step for hour in sorted(self._energy)]
+
+    def get_count(self, hour):
+        return self._counts.get(int(hour) // self._step, 0)
+
+    def get_energy(self, hour):
+        return self._energy.get(int(hour) // self._step, np.zeros(self.COLUMNS))
+
+    def get_totals(self):
+        if len(self._energy) == 0:
+            return np.zeros(self.COLUMNS)
+
+        return np.sum([self._energy[hour] for hour in sorted(self._energy)], axis=0)
+
+    def __str__(self):
+        return f"[HourlyEnergy: hours={len(self._energy)}, fragments={sum(self._counts.values())}]"
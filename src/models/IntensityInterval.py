@@ -1,4 +1,6 @@
 class IntensityInterval:
+    __slots__ = ("_date", "_start", "_end", "_forecast", "_actual", "_index")
+
     def __init__(self, date, start, end, forecast, actual, index):
         self._date = str(date)
         self._start = str(start)
@@ -0,0 +1,66 @@
+from collections import OrderedDict
+from threading import Lock
+
+
+class LRUCache:
+    # least recently used entries are evicted beyond capacity, an entry stored with a version only hits for that version
+    __slots__ = ("_capacity", "_entries", "_lock", "_hits", "_misses", "_evictions")
+
+    def __init__(self, capacity):
+        self._capacity = max(int(capacity), 1)
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, version=None):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None or entry[0] != version:
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+
+    def put(self, key, value, version=None):
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self._capacity:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def get_or_load(self, key, load, version=None):
+        # load is called outside of the lock, so a slow load does not block hits on other keys
+        value = self.get(key, version)
+
+        if value is None:
+            value = load()
+            self.put(key, value, version)
+
+        return value
+
+    def get_stats(self):
+        lookups = self._hits + self._misses
+        return {
+            "entries": len(self._entries),
+            "capacity": self._capacity,
+            "hits": self._hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+            "hit-rate": self._hits / lookups if lookups > 0 else None
+        }
+
+    def __str__(self):
+        return f"[LRUCache: entries={len(self._entries)}, capacity={self._capacity}, hits={self._hits}, misses={self._misses}]"
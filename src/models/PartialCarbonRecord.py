@@ -0,0 +1,78 @@
+from src.models.CarbonRecord import CarbonRecord
+
+
+class PartialCarbonRecord:
+    # slice of a CarbonRecord within one hour, task details are read from the parent record
+    __slots__ = ("_record", "_start", "_complete", "_realtime", "_energy", "_co2e", "_avg_ci")
+
+    def __init__(self, record: CarbonRecord, start, complete, realtime):
+        self._record = record
+        self._start = start
+        self._complete = complete
+        self._realtime = realtime
+        self._energy = None
+        self._co2e = None
+        self._avg_ci = None
+
+    def get_record(self):
+        return self._record
+
+    def get_realtime(self):
+        return self._realtime
+
+    def set_realtime(self, realtime):
+        self._realtime = realtime
+
+    def get_core_count(self):
+        return self._record.get_core_count()
+
+    def get_start(self):
+        return self._start
+
+    def set_start(self, start):
+        self._start = start
+
+    def get_complete(self):
+        return self._complete
+
+    def set_complete(self, complete):
+        self._complete = complete
+
+    def get_cpu_powerdraw(self):
+        return self._record.get_cpu_powerdraw()
+
+    def get_cpu_usage(self):
+        return self._record.get_cpu_usage()
+
+    def get_memory(self):
+        return self._record.get_memory()
+
+    def get_memory_powerdraw(self):
+        return self._record.get_memory_powerdraw()
+
+    def get_energy(self):
+        return self._energy
+
+    def get_co2e(self):
+        return self._co2e
+
+    def get_cpu_model(self):
+        return self._record.get_cpu_model()
+
+    def get_name(self):
+        return self._record.get_name()
+
+    def set_energy(self, energy):
+        self._energy = energy
+
+    def set_co2e(self, co2e):
+        self._co2e = co2e
+
+    def get_avg_ci(self):
+        return self._avg_ci
+
+    def set_avg_ci(self, ci):
+        self._avg_ci = ci
+
+    def __str__(self):
+        return f"{self.get_name()},{self._co2e},{self._energy},{self._avg_ci},{self._realtime},{self.get_cpu_model()},{self.get_core_count()},{self.get_cpu_powerdraw()},{self.get_cpu_usage()},{self.get_memory()},{self.get_memory_powerdraw()}"
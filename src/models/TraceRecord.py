@@ -1,78 +1,39 @@
 from src.models.CarbonRecord import CarbonRecord
+from src.models.TraceSchema import TraceSchema, CONVERTERS, parse_text, get_trace_schema
 
 
 class TraceRecord:
-    def __init__(self, fields, data, delimiter):
-        self._raw = self.get_raw_data_map(fields, data, delimiter)
-        self._realtime = self._raw['realtime']
-
-        if 'start' in self._raw:
-            self._start = self._raw['start']
-        else:
-            self._start = None 
-
-        if 'complete' in self._raw:
-            self._complete = self._raw['complete']
-        else:
-            self._complete = None
-
-        self._cpu_count = self._raw['cpus']
-        self._cpu_usage = self._raw['%cpu']
-
-        if 'cpu_model' in self._raw:
-            self._cpu_model = self._raw['cpu_model']
+    __slots__ = ("_raw", "_realtime", "_start", "_complete", "_cpu_count", "_cpu_usage", "_cpu_model",
+                 "_memory", "_name", "_task_id", "_hash", "_process", "_submit")
+
+    def __init__(self, fields, data, delimiter, keep_raw=False):
+        # fields is either the header line or a TraceSchema compiled from it
+        if isinstance(fields, TraceSchema):
+            schema = fields
+            fields = schema.get_header()
         else:
-            self._cpu_model = None
-
-        self._memory = self._raw['memory']
-        self._name = self._raw['name']
-        self._task_id = self._raw['task_id']
+            schema = get_trace_schema(fields, delimiter)
 
-        if 'hash' in self._raw:
-            self._hash = self._raw['hash']
+        # the full column map is only built when asked for
+        if keep_raw:
+            self._raw = self.get_raw_data_map(fields, data, delimiter)
         else:
-            self._hash = None
+            self._raw = None
 
-        self._process = self._raw['process']
-        self._realtime = self._raw['realtime']
-        self._submit = self._raw['submit']
+        (self._realtime, self._start, self._complete, self._cpu_count, self._cpu_usage, self._cpu_model,
+         self._memory, self._name, self._task_id, self._hash, self._process, self._submit) = schema.decode(data)
 
     def get_raw_data_map(self, fields, data, delimiter):
         raw = {}
 
         for field, value in zip(fields.split(delimiter), data.split(delimiter)):
-            value = value.strip()
-
-            if field == "memory":  # format x GB|MB|KB
-                parts = value.split(" ")
-                if len(parts) == 1:
-                    value = float(parts[0][:-1]) / 1000000
-                elif parts[1] == "GB":
-                    value = int(parts[0])
-                elif parts[1] == "MB":
-                    value = int(parts[0]) / 1000
-                elif parts[1] == "KB":
-                    value = int(parts[0]) / 1000000
-            # elif field == "start" or field == "complete":  # format yyyy-mm-dd hh:mm:ss.mss
-            #     value = datetime.strptime(value, "%Y-%m-%d %H:%M:%S.%f")
-            elif field == "duration" or field == "realtime":  # format (xh) (ym) (zs)
-                parts = value.split(" ")
-                value = float(value.strip())
-            elif field == "%cpu":  # format x.y%
-                if value[:-1] == '':
-                    value = 0.0
-                else:
-                    value = float(value[:-1])
-            elif field == "cpus":
-                if value == '-':
-                    value = 1
-                else:
-                    value = int(value)
-
-            raw[field] = value
+            raw[field] = CONVERTERS.get(field, parse_text)(value.strip())
 
         return raw 
 
+    def get_raw(self):
+        return self._raw
+
     def make_carbon_record(self):
         return CarbonRecord(None, None, self._realtime, self._start, self._complete, self._cpu_count, None, self._cpu_usage, self._cpu_model, self._memory, self._name)
 
@@ -100,6 +61,9 @@ class TraceRecord:
     def get_cpu_model(self):
         return self._cpu_model
 
+    def get_name(self):
+        return self._name
+
     def get_task_id(self):
         return self._task_id
     
@@ -122,4 +86,8 @@ class TraceRecord:
         return self._start
 
     def __str__(self):
-        return f"[TraceRecord: {str(self._raw)}]"
+        if self._raw is not None:
+            return f"[TraceRecord: {str(self._raw)}]"
+
+        fields = {key[1:]: getattr(self, key) for key in self.__slots__ if key != '_raw'}
+        return f"[TraceRecord: {str(fields)}]"
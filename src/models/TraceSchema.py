@@ -0,0 +1,113 @@
+# Columns read from a trace row, with whether the trace must provide them
+TRACE_FIELDS = [
+    ("realtime", True),
+    ("start", False),
+    ("complete", False),
+    ("cpus", True),
+    ("%cpu", True),
+    ("cpu_model", False),
+    ("memory", True),
+    ("name", True),
+    ("task_id", True),
+    ("hash", False),
+    ("process", True),
+    ("submit", True),
+]
+
+
+def parse_memory(value):  # format x GB|MB|KB
+    parts = value.split(" ")
+    if len(parts) == 1:
+        value = float(parts[0][:-1]) / 1000000
+    elif parts[1] == "GB":
+        value = int(parts[0])
+    elif parts[1] == "MB":
+        value = int(parts[0]) / 1000
+    elif parts[1] == "KB":
+        value = int(parts[0]) / 1000000
+    return value
+
+
+def parse_duration(value):  # format (xh) (ym) (zs)
+    return float(value.strip())
+
+
+def parse_cpu_percentage(value):  # format x.y%
+    if value[:-1] == '':
+        return 0.0
+    else:
+        return float(value[:-1])
+
+
+def parse_cpus(value):
+    if value == '-':
+        return 1
+    else:
+        return int(value)
+
+
+def parse_text(value):
+    return value
+
+
+CONVERTERS = {
+    "memory": parse_memory,
+    "duration": parse_duration,
+    "realtime": parse_duration,
+    "%cpu": parse_cpu_percentage,
+    "cpus": parse_cpus,
+}
+
+
+class TraceSchema:
+    # header compiled once per trace, rows are then decoded for the projected columns only
+    def __init__(self, header, delimiter, fields=TRACE_FIELDS):
+        self._header = header
+        self._delimiter = delimiter
+        indices = {}
+
+        for (i, field) in enumerate(header.split(delimiter)):
+            indices[field] = i  # a repeated column keeps its last value
+
+        self._columns = []
+
+        for (field, required) in fields:
+            if field not in indices and required:
+                raise KeyError(field)
+
+            self._columns.append((field, indices.get(field), CONVERTERS.get(field, parse_text), required))
+
+    def get_header(self):
+        return self._header
+
+    def get_delimiter(self):
+        return self._delimiter
+
+    def get_fields(self):
+        return [field for (field, _, _, _) in self._columns]
+
+    def decode(self, data):
+        parts = data.split(self._delimiter)
+        values = []
+
+        for (field, index, converter, required) in self._columns:
+            if index is not None and index < len(parts):
+                values.append(converter(parts[index].strip()))
+            elif required:
+                raise KeyError(field)
+            else:
+                values.append(None)
+
+        return values
+
+
+_schemas = {}
+
+
+def get_trace_schema(header, delimiter):
+    key = (header, delimiter)
+
+    if key not in _schemas:
+        _schemas[key] = TraceSchema(header, delimiter)
+
+    return _schemas[key]
@@ -0,0 +1,158 @@
+from src.scripts.CarbonFootprint import extract_task_batch, get_tasks_by_hour_stream, get_fragment_columns, get_task_columns, get_time_weighted_ci, \
+    calculate_carbon_footprint_ccf_columns, parse_ci_series, check_if_float, START, COMPLETE, CI, HOUR, DEFAULT_PUE_VALUE, DEFAULT_MEMORY_POWER_DRAW
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from collections import deque
+from glob import glob
+import os
+import sys
+import numpy as np
+
+
+# Default Values
+FILE = "csv"
+DELIMITER = ","
+TRACE_FOLDER = "data/trace"
+CI_FOLDER = "data/intensity"
+INTEGRATE_FLAG = "--integrate"
+OUTPUT_FLAG = "--output="
+WORKERS_FLAG = "--workers="
+DEFAULT_OUTPUT = "output/batch-footprint.csv"
+HEADERS = ["trace", "ci", "energy", "energy-pue", "memory", "memory-pue", "co2e"]
+PREFETCH = 2  # traces read ahead per worker while earlier traces are evaluated
+
+
+# Functions
+def print_usage_exit():
+    usage = "Ichnos (Batch): python -m src.scripts.BatchFootprint <trace-names|globs> <ci-values|ci-file-names|globs> <min-watts> <max-watts> <? pue=1.0> <? memory-coeff=0.392> <? --integrate> <? --output=file> <? --workers=n>"
+    example = "Ichnos (Batch): python -m src.scripts.BatchFootprint 'chipseq-*,rnaseq-*' ci,ci-uk-*,475 65 113 1.0 0.392 --output=output/batch.csv"
+    print(usage)
+    print(example)
+    exit(-1)
+
+
+def expand_names(patterns, folder, values=False):
+    # comma separated names or globs of csv files in folder, with values numbers are kept as fixed ci values
+    names = []
+
+    for pattern in [val.strip() for val in patterns.split(",") if len(val.strip()) > 0]:
+        if values and check_if_float(pattern):
+            names.append(float(pattern))
+            continue
+
+        if pattern.endswith(f".{FILE}"):
+            pattern = pattern[:-len(FILE) - 1]
+
+        files = sorted(glob(os.path.join(folder, f"{pattern}.{FILE}")))
+
+        if len(files) == 0:
+            raise FileNotFoundError(os.path.join(folder, f"{pattern}.{FILE}"))
+
+        names.extend([os.path.splitext(os.path.basename(file))[0] for file in files])
+
+    return list(dict.fromkeys(names))  # a trace or ci matched by several patterns is evaluated once
+
+
+def parse_ci(name):
+    if isinstance(name, float):
+        return (str(int(name)), name)
+
+    return (name, parse_ci_series(f"{CI_FOLDER}/{name}.{FILE}"))
+
+
+def extract_trace_columns(trace, integrate=False):
+    # everything that does not depend on the ci, done once per trace whichever ci files it is evaluated against
+    if integrate:
+        return get_task_columns(extract_task_batch(trace))
+
+    (tasks_by_hour, _) = get_tasks_by_hour_stream(extract_task_batch(trace))
+    (columns, _) = get_fragment_columns(tasks_by_hour, 1.0)
+    return columns
+
+
+def get_ci_column(columns, ci, integrate=False):
+    if isinstance(ci, float):
+        return np.full(len(columns[START]), ci)
+
+    if integrate:
+        return get_time_weighted_ci(ci, columns[START], columns[COMPLETE])
+
+    return ci.get_values_at(columns[HOUR])  # raises KeyError for hours without data, as get_ci_for_hour does
+
+
+def evaluate_trace(columns, cis, pue, min_watts, max_watts, memory_coefficient, integrate=False):
+    # totals for one trace against every ci, a ci that does not cover the trace gives nan totals
+    results = []
+
+    for (ci_name, ci) in cis:
+        try:
+            columns[CI] = get_ci_column(columns, ci, integrate)
+            totals = calculate_carbon_footprint_ccf_columns(columns, None, pue, min_watts, max_watts, memory_coefficient)
+        except KeyError:
+            totals = tuple([float("nan")] * (len(HEADERS) - 2))
+
+        results.append((ci_name, totals))
+
+    return results
+
+
+def iter_trace_columns(traces, integrate=False, workers=1):
+    # producer side of the pipeline, traces are read by a pool while the caller evaluates the ones already read
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else ThreadPoolExecutor(max_workers=1)
+
+    with executor:
+        pending = deque()
+        traces = deque(traces)
+
+        while len(pending) > 0 or len(traces) > 0:
+            while len(traces) > 0 and len(pending) < workers * PREFETCH:
+                trace = traces.popleft()
+                pending.append((trace, executor.submit(extract_trace_columns, trace, integrate)))
+
+            (trace, future) = pending.popleft()
+            yield (trace, future.result())  # results keep the order of traces
+
+
+def write_row(file, values):
+    file.write(f"{DELIMITER.join([str(val) for val in values])}\n")
+
+
+def main(traces, cis, pue, min_watts, max_watts, memory_coefficient, integrate=False, output=DEFAULT_OUTPUT, workers=1):
+    # every trace and ci file is parsed once, each trace row block is written as soon as it is evaluated
+    cis = [parse_ci(name) for name in cis]
+    count = 0
+
+    with open(output, 'w') as file:
+        write_row(file, HEADERS)
+
+        for (trace, columns) in iter_trace_columns(traces, integrate, workers):
+            for (ci_name, totals) in evaluate_trace(columns, cis, pue, min_watts, max_watts, memory_coefficient, integrate):
+                write_row(file, [trace, ci_name] + list(totals))
+                count += 1
+
+            file.flush()
+
+    print(f"[BatchFootprint] Evaluated {count} Trace and CI Combinations to [{output}]")
+    return count
+
+
+# Main Script
+if __name__ == '__main__':
+    # Parse Arguments
+    arguments = sys.argv[1:]
+    integrate = INTEGRATE_FLAG in arguments
+    output = [argument[len(OUTPUT_FLAG):] for argument in arguments if argument.startswith(OUTPUT_FLAG)]
+    workers = [int(argument[len(WORKERS_FLAG):]) for argument in arguments if argument.startswith(WORKERS_FLAG)]
+    arguments = [argument for argument in arguments if argument != INTEGRATE_FLAG and not argument.startswith((OUTPUT_FLAG, WORKERS_FLAG))]
+
+    if len(arguments) != 4 and len(arguments) != 6:
+        print_usage_exit()
+
+    traces = expand_names(arguments[0], TRACE_FOLDER)
+    cis = expand_names(arguments[1], CI_FOLDER, values=True)
+    min_watts = float(arguments[2])
+    max_watts = float(arguments[3])
+    pue = float(arguments[4]) if len(arguments) == 6 else DEFAULT_PUE_VALUE
+    memory_coefficient = float(arguments[5]) if len(arguments) == 6 else DEFAULT_MEMORY_POWER_DRAW
+    workers = workers[-1] if len(workers) > 0 else os.cpu_count()
+
+    main(traces, cis, pue, min_watts, max_watts, memory_coefficient, integrate, output[-1] if len(output) > 0 else DEFAULT_OUTPUT, min(workers, max(len(traces), 1)))
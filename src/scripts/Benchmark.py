@@ -0,0 +1,258 @@
+from src.scripts.CarbonFootprint import parse_trace_file, get_carbon_record, get_tasks_by_hour, calculate_carbon_footprint_ccf, write_trace_file, \
+    parse_ci_series
+from src.scripts.TemporalInterrupt import explore_temporal_shifting_for_workflow
+from tempfile import TemporaryDirectory
+from timeit import default_timer
+import datetime as time
+import gc
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tracemalloc
+import numpy as np
+
+
+# Default Values
+FILE = "csv"
+DELIMITER = ","
+BENCHMARK_FOLDER = "data/benchmark"  # generated inputs, reused while their parameters are unchanged
+DEFAULT_OUTPUT = "output/benchmark.jsonl"
+DAYS_FLAG = "--days="
+DURATION_FLAG = "--duration="
+DISTRIBUTION_FLAG = "--distribution="
+WIDTH_FLAG = "--width="
+CI_STEP_FLAG = "--ci-step="
+SEED_FLAG = "--seed="
+REPEAT_FLAG = "--repeat="
+OUTPUT_FLAG = "--output="
+NO_MEMORY_FLAG = "--no-memory"
+DISTRIBUTIONS = ["lognormal", "exponential", "uniform", "fixed"]
+CHUNK_SIZE = 100000  # rows generated and written at a time, so 10^7 task traces fit in memory
+PROCESSES = 24  # distinct processes in a generated trace, each with its own typical duration
+TRACE_VERSION = 2  # part of the generated trace names, so traces from an older generator are not reused
+SHIFT_MARGIN_DAYS = 5  # ci data either side of the trace, TemporalInterrupt shifts up to 96 intervals
+MAX_DURATION_MS = 2 * 24 * 60 * 60 * 1000  # longest task, as a scheduler time limit would
+START_MS = 1710288000000  # 2024-03-13 00:00 UTC, as data/trace/test.csv
+MIN_WATTS = 65
+MAX_WATTS = 113
+PUE = 1.0
+MEMORY_COEFFICIENT = 0.392
+TRACE_HEADERS = ["task_id", "hostname", "hash", "native_id", "process", "tag", "name", "status", "exit", "module", "container", "cpus", "time",
+                 "disk", "memory", "attempt", "submit", "start", "complete", "duration", "realtime", "queue", "%cpu", "%mem", "rss", "vmem",
+                 "peak_rss", "peak_vmem", "rchar", "wchar", "syscr", "syscw", "read_bytes", "write_bytes", "vol_ctxt", "inv_ctxt", "workdir",
+                 "scratch", "error_action", "cpu_model"]
+
+
+# Functions
+def print_usage_exit():
+    usage = "Ichnos (Benchmark): python -m src.scripts.Benchmark <tasks,...> <? --days=2> <? --duration=seconds> <? --distribution=lognormal|exponential|uniform|fixed> " \
+            "<? --width=90> <? --ci-step=minutes> <? --seed=0> <? --repeat=1> <? --no-memory> <? --output=output/benchmark.jsonl>"
+    example = "Ichnos (Benchmark): python -m src.scripts.Benchmark 1000,10000,100000 --days=3 --ci-step=30 --repeat=3"
+    print(usage)
+    print(example)
+    exit(-1)
+
+
+def get_durations(random, size, mean, distribution):
+    # task durations in ms with the given mean (s)
+    if distribution == "lognormal":
+        sigma = 1.0
+        seconds = random.lognormal(np.log(mean) - sigma ** 2 / 2, sigma, size)
+    elif distribution == "exponential":
+        seconds = random.exponential(mean, size)
+    elif distribution == "uniform":
+        seconds = random.uniform(0, 2 * mean, size)
+    elif distribution == "fixed":
+        seconds = np.full(size, float(mean))
+    else:
+        raise ValueError(f"unknown duration distribution '{distribution}', expected one of {DISTRIBUTIONS}")
+
+    return np.maximum(seconds * 1000, 1).astype(np.int64)
+
+
+def get_trace_filename(tasks, days, duration, distribution, width, seed):
+    return f"{BENCHMARK_FOLDER}/trace-v{TRACE_VERSION}-{tasks}-{days}d-{distribution}-{duration}s-{width}w-{seed}.{FILE}"
+
+
+def generate_trace(filename, tasks, days=2, duration=600, distribution="lognormal", width=90, seed=0):
+    # nextflow trace with tasks starting across days, rows in roughly start order as a pipeline would write them
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"unknown duration distribution '{distribution}', expected one of {DISTRIBUTIONS}")
+
+    random = np.random.default_rng(seed)
+    scales = random.lognormal(0.0, 1.0, PROCESSES)  # some processes are much longer running than others
+    scales = scales / scales.mean()  # while the mean duration stays at duration
+    span = days * 24 * 60 * 60 * 1000
+    temp_filename = f"{filename}.{os.getpid()}.tmp"  # an interrupted run never leaves a partial trace to be reused
+
+    with open(temp_filename, 'w') as file:
+        file.write(f"{DELIMITER.join(TRACE_HEADERS)}\n")
+
+        for first in range(0, tasks, CHUNK_SIZE):
+            size = min(CHUNK_SIZE, tasks - first)
+            ids = np.arange(first, first + size) + 1
+            starts = START_MS + ((first + np.sort(random.uniform(0, size, size))) / tasks * span).astype(np.int64)
+            processes = random.integers(0, PROCESSES, size)
+            realtimes = np.minimum(get_durations(random, size, duration, distribution) * scales[processes], MAX_DURATION_MS).astype(np.int64)
+            completes = starts + realtimes + random.integers(0, 100, size)
+            submits = starts - random.integers(0, 60000, size)
+            cpus = random.choice([1, 2, 4, 8, 16], size)
+            cpu_usage = random.uniform(1, 100, size) * cpus
+            memory = random.choice([2 ** 30, 2 ** 31, 2 ** 32, 2 ** 34], size)
+            hashes = random.integers(0, 16 ** 8, size)
+            rows = []
+
+            for (i, process, cpu, mem, submit, start, complete, realtime, usage, hash_value) in zip(
+                    ids.tolist(), processes.tolist(), cpus.tolist(), memory.tolist(), submits.tolist(), starts.tolist(), completes.tolist(),
+                    realtimes.tolist(), cpu_usage.tolist(), hashes.tolist()):
+                task_hash = f"{hash_value:08x}"
+                workdir = f"/work/{task_hash[:2]}/{task_hash[2:]}".ljust(width, "0")
+                rows.append(f"{i},-,{task_hash[:2]}/{task_hash[2:8]},{i + 10000},NFCORE_BENCH:BENCH:PROCESS_{process},-,PROCESS_{process} ({i}),COMPLETED,0,-,"
+                            f"quay.io/biocontainers/bench:1.0,{cpu},-,-,{mem},1,{submit},{start},{complete},{complete - submit},{realtime},-,"
+                            f"{usage:.1f},1.4,{mem // 16},{mem // 4},{mem // 16},{mem // 4},0,0,0,0,0,0,0,0,{workdir},-,-,Intel Xeon")
+
+            file.write("\n".join(rows))
+            file.write("\n")
+
+    os.replace(temp_filename, filename)
+    return filename
+
+
+def get_ci_filename(start, days, step, seed):
+    return f"{BENCHMARK_FOLDER}/ci-{start}-{days}d-{step}m-{seed}.{FILE}"
+
+
+def generate_ci(filename, start=START_MS, days=2, step=30, seed=0):
+    # carbon intensity every step minutes with a daily cycle and noise, in the layout FetchCarbonIntensity writes
+    random = np.random.default_rng(seed)
+    intervals = days * 24 * 60 // step
+    timestamps = start + np.arange(intervals, dtype=np.int64) * step * 60 * 1000
+    hours = (timestamps // (60 * 60 * 1000)) % 24
+    forecast = 180 + 80 * np.sin((hours - 6) / 24 * 2 * np.pi)
+    actual = np.clip(forecast + random.normal(0, 30, intervals), 20, 400).astype(np.int64)
+    temp_filename = f"{filename}.{os.getpid()}.tmp"
+
+    with open(temp_filename, 'w') as file:
+        file.write("date,start,end,forecast,actual,index\n")
+
+        for (timestamp, forecast_value, actual_value) in zip(timestamps.tolist(), forecast.astype(np.int64).tolist(), actual.tolist()):
+            begin = time.datetime.fromtimestamp(timestamp / 1000, tz=time.timezone.utc)
+            end = begin + time.timedelta(minutes=step)
+            index = "low" if actual_value < 150 else ("moderate" if actual_value < 250 else "high")
+            file.write(f"{begin:%Y-%m-%d},{begin:%H:%M},{end:%H:%M},{forecast_value},{actual_value},{index}\n")
+
+    os.replace(temp_filename, filename)
+    return filename
+
+
+def time_stage(stages, name, function, repeat=1, memory=True):
+    # best of repeat runs, the peak python allocation is measured on a separate run as tracing slows the stage down
+    runs = []
+    peak = None
+
+    for _ in range(max(repeat, 1)):
+        value = None  # the previous result is released before the next run
+        gc.collect()
+        started = default_timer()
+        value = function()
+        runs.append(default_timer() - started)
+
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        function()
+        (_, peak) = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    stages[name] = {"seconds": min(runs), "runs": runs, "peak-bytes": peak}
+    print(f"[Benchmark] {name}: {min(runs):.4f}s" + (f", peak {peak / 1048576:.1f}MB" if peak is not None else ""))
+
+    return value
+
+
+def get_commit():
+    # the commit being measured, so results can be compared across commits
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = len(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True, check=True).stdout.strip()) > 0
+        return (commit, dirty)
+    except (OSError, subprocess.CalledProcessError):
+        return (None, None)
+
+
+def run_benchmark(tasks, days=2, duration=600, distribution="lognormal", width=90, ci_step=30, seed=0, repeat=1, memory=True):
+    os.makedirs(BENCHMARK_FOLDER, exist_ok=True)
+    trace_filename = get_trace_filename(tasks, days, duration, distribution, width, seed)
+    ci_start = START_MS - SHIFT_MARGIN_DAYS * 24 * 60 * 60 * 1000
+    ci_days = days + 2 * SHIFT_MARGIN_DAYS + MAX_DURATION_MS // (24 * 60 * 60 * 1000)  # room for the longest running tasks
+    ci_filename = get_ci_filename(ci_start, ci_days, ci_step, seed)
+
+    if not os.path.exists(trace_filename):
+        generate_trace(trace_filename, tasks, days, duration, distribution, width, seed)
+
+    if not os.path.exists(ci_filename):
+        generate_ci(ci_filename, ci_start, ci_days, ci_step, seed)
+
+    stages = {}
+    name = os.path.splitext(os.path.basename(trace_filename))[0]
+    print(f"[Benchmark] {tasks} Tasks over {days} Days ({distribution}, mean {duration}s), CI every {ci_step} Minutes")
+
+    ci = time_stage(stages, "parse_ci_series", lambda: parse_ci_series(ci_filename), repeat, memory)
+    records = time_stage(stages, "parse_trace_file", lambda: parse_trace_file(trace_filename), repeat, memory)
+    tasks_list = time_stage(stages, "get_carbon_record", lambda: [get_carbon_record(record) for record in records], repeat, memory)
+    (tasks_by_hour, overhead_hours) = time_stage(stages, "get_tasks_by_hour", lambda: get_tasks_by_hour(tasks_list), repeat, memory)
+    (totals, carbon_records) = time_stage(stages, "calculate_carbon_footprint_ccf",
+                                          lambda: calculate_carbon_footprint_ccf(tasks_by_hour, ci, PUE, MIN_WATTS, MAX_WATTS, MEMORY_COEFFICIENT), repeat, memory)
+
+    with TemporaryDirectory() as folder:
+        time_stage(stages, "write_trace_file", lambda: write_trace_file(folder, name, carbon_records), repeat, memory)
+
+    time_stage(stages, "temporal_interrupt_shifting", lambda: explore_temporal_shifting_for_workflow(
+        name, tasks_by_hour, ci, MIN_WATTS, MAX_WATTS, overhead_hours, PUE, MEMORY_COEFFICIENT), repeat, memory)
+    (commit, dirty) = get_commit()
+
+    return {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": time.datetime.now(tz=time.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "parameters": {"tasks": tasks, "days": days, "duration": duration, "distribution": distribution, "width": width,
+                       "ci-step": ci_step, "seed": seed, "repeat": repeat, "trace-bytes": os.path.getsize(trace_filename)},
+        "co2e": totals[-1],
+        "stages": stages,
+        "max-rss-bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    }
+
+
+def get_flag(arguments, flag, default, convert):
+    values = [convert(argument[len(flag):]) for argument in arguments if argument.startswith(flag)]
+    return values[-1] if len(values) > 0 else default
+
+
+# Main Script
+if __name__ == '__main__':
+    # Parse Arguments
+    arguments = sys.argv[1:]
+    flags = (DAYS_FLAG, DURATION_FLAG, DISTRIBUTION_FLAG, WIDTH_FLAG, CI_STEP_FLAG, SEED_FLAG, REPEAT_FLAG, OUTPUT_FLAG)
+    options = [argument for argument in arguments if argument.startswith(flags) or argument == NO_MEMORY_FLAG]
+    arguments = [argument for argument in arguments if argument not in options]
+
+    if len(arguments) != 1:
+        print_usage_exit()
+
+    output = get_flag(options, OUTPUT_FLAG, DEFAULT_OUTPUT, str)
+
+    for tasks in [int(val) for val in arguments[0].split(",") if len(val) > 0]:
+        result = run_benchmark(tasks, get_flag(options, DAYS_FLAG, 2, int), get_flag(options, DURATION_FLAG, 600, int),
+                               get_flag(options, DISTRIBUTION_FLAG, "lognormal", str), get_flag(options, WIDTH_FLAG, 90, int),
+                               get_flag(options, CI_STEP_FLAG, 30, int), get_flag(options, SEED_FLAG, 0, int), get_flag(options, REPEAT_FLAG, 1, int),
+                               NO_MEMORY_FLAG not in options)
+
+        # one json object per line, appended so results from every commit are kept side by side
+        with open(output, 'a') as file:
+            file.write(f"{json.dumps(result)}\n")
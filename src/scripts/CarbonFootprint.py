@@ -1,8 +1,15 @@
 from src.models.TraceRecord import TraceRecord
-from src.models.CarbonRecord import CarbonRecord, HEADERS
+from src.models.TraceSchema import TraceSchema
+from src.models.CarbonRecord import HEADERS
+from src.models.PartialCarbonRecord import PartialCarbonRecord
+from src.models.CarbonIntensitySeries import CarbonIntensitySeries, make_carbon_intensity_series
+from src.models.CarbonRecordBatch import CarbonRecordBatch, make_carbon_record_batch, save_carbon_record_batch, load_carbon_record_batch
 import sys
+import os
+import hashlib
 import datetime as time
-import copy
+import numpy as np
+from itertools import islice
 
 
 # Default Values
@@ -11,6 +18,7 @@ FILE = "csv"
 DELIMITER = ","
 TRACE = "trace"
 CI = "ci"
+CI_NAME = "ci-name"
 PUE = "pue"
 CORE_POWER_DRAW = "core-power-draw"
 MEMORY_COEFFICIENT = "memory-coefficient"
@@ -21,6 +29,23 @@ CCF = "CCF"
 BOTH = "BOTH"
 DEFAULT_PUE_VALUE = 1.0  # Disregard PUE if 1.0
 DEFAULT_MEMORY_POWER_DRAW = 0.392  # W/GB
+BYTES_PER_GB = 1073741824  # memory is reported in bytes, GB here is 2^30 bytes
+HOUR_MS = 60 * 60 * 1000  # 60 minutes in ms
+START = "start"
+COMPLETE = "complete"
+REALTIME = "realtime"
+CPUS = "cpus"
+CPU_USAGE = "%cpu"
+MEMORY = "memory"
+HOUR = "hour"
+STREAM = "stream"
+STREAM_FLAG = "--stream"
+INTEGRATE = "integrate"
+INTEGRATE_FLAG = "--integrate"
+BATCH_SIZE = 10000  # records held in memory at once when streaming
+CACHE_FILE = "npz"
+CACHE_VERSION = 1
+EPOCH_ORDINAL = time.date(1970, 1, 1).toordinal()
 
 
 # Functions
@@ -44,42 +69,70 @@ def get_ci_file_data(filename):
     return (header, data)
 
 
-def parse_ci_intervals(filename):
+def to_ci_timestamp_ms(date, start):
+    # date as YYYY-MM-DD, YYYY/MM/DD or DD/MM/YYYY and start as HH:MM, both in UTC
+    parts = date.strip().replace('/', '-').split('-')
+
+    if len(parts[0]) == 4:
+        (year, month, day) = parts
+    else:
+        (day, month, year) = parts
+
+    days = time.date(int(year), int(month), int(day)).toordinal() - EPOCH_ORDINAL
+    (hh, mm) = start.strip().split(':')[:2]
+
+    return ((days * 24 + int(hh)) * 60 + int(mm)) * 60 * 1000
+
+
+def parse_ci_series(filename):
     (header, data) = get_ci_file_data(filename)
 
     date_i = header.index("date")
     start_i = header.index("start")
     value_i = header.index("actual")
 
-    ci_map = {}
+    timestamps = []
+    values = []
 
     for row in data:
         parts = row.split(",")
-        date = parts[date_i]
-        month_day = '/'.join([val.zfill(2) for val in date.split('-')[-2:]])
-        key = month_day + '-' + parts[start_i]
-        value = float(parts[value_i])
-        ci_map[key] = value
 
-    return ci_map
+        if len(parts) <= max(date_i, start_i, value_i):
+            continue
 
+        timestamps.append(to_ci_timestamp_ms(parts[date_i], parts[start_i]))
+        values.append(float(parts[value_i]))
 
-def parse_trace_file(filepath):
+    return make_carbon_intensity_series(timestamps, values)
+
+
+def iter_trace_file(filepath):
+    # yields records as lines are read, so only one row is held in memory at a time
     with open(filepath, 'r') as file:
-        lines = [line.rstrip() for line in file]
+        schema = TraceSchema(file.readline().rstrip(), DELIMITER)
+
+        for line in file:
+            line = line.rstrip()
+
+            if line:
+                yield TraceRecord(schema, line, DELIMITER)
 
-    header = lines[0]
-    records = []
 
-    for line in lines[1:]:
-        trace_record = TraceRecord(header, line, DELIMITER)
-        records.append(trace_record)
+def iter_batches(records, batch_size=BATCH_SIZE):
+    records = iter(records)
+    batch = list(islice(records, batch_size))
 
-    return records
+    while batch:
+        yield batch
+        batch = list(islice(records, batch_size))
+
+
+def parse_trace_file(filepath):
+    return list(iter_trace_file(filepath))
 
 
 def print_usage_exit():
-    usage = "Ichnos (Linear): python -m src.scripts.CarbonFootprint <trace-name> <ci-value|ci-file-name> <min-watts> <max-watts> <? pue=1.0> <? memory-coeff=0.392>"
+    usage = "Ichnos (Linear): python -m src.scripts.CarbonFootprint <trace-name> <ci-value|ci-file-name> <min-watts> <max-watts> <? pue=1.0> <? memory-coeff=0.392> <? --stream> <? --integrate>"
     print(usage)
     exit(-1)
 
@@ -88,57 +141,49 @@ def get_carbon_record(record: TraceRecord):
     return record.make_carbon_record()
 
 
+def get_task_fragments(task, first_hour, hours, step=HOUR_MS):
+    start = int(task.get_start())
+    complete = int(task.get_complete())
+    # only visit the hours the task can overlap (one hour either side covers boundary tasks)
+    first_index = max((min(start, complete) - first_hour) // step - 1, 0)
+    last_index = (max(start, complete) - first_hour) // step
+
+    if hours is not None:
+        last_index = min(last_index, hours - 1)
+
+    for index in range(first_index, last_index + 1):
+        i = first_hour + index * step
+        # full task is within this hour
+        if start >= i and complete <= i + step:
+            yield (index, task, 0)
+        # task ends within this hour (but starts in a previous hour)
+        elif complete > i and complete < i + step and start < i:
+            # add task from start of this hour until end of hour
+            yield (index, PartialCarbonRecord(task, i, task.get_complete(), complete - i), 0)
+        # task starts within this hour (but ends in a later hour) -- OVERHEAD
+        elif start > i and start < i + step and complete > i + step:
+            # add task from start to end of this hour
+            yield (index, PartialCarbonRecord(task, task.get_start(), i + step, i + step - start), i + step - start)
+        # task starts before hour and ends after this hour
+        elif start < i and complete > i + step:
+            yield (index, PartialCarbonRecord(task, i, i + step, step), 0)
+
+
 def get_tasks_by_hour_with_overhead(start_hour, end_hour, tasks):
-    tasks_by_hour = {}
-    overheads = []
-    runtimes = []
-
-    step = 60 * 60 * 1000  # 60 minutes in ms
-    i = start_hour - step  # start an hour before to be safe
-
-    while i <= end_hour:
-        data = [] 
-        hour_overhead = 0
-
-        for task in tasks: 
-            start = int(task.get_start())
-            complete = int(task.get_complete())
-            # full task is within this hour
-            if start >= i and complete <= i + step:
-                data.append(task)
-                runtimes.append(complete - start)
-            # task ends within this hour (but starts in a previous hour)
-            elif complete > i and complete < i + step and start < i:
-                # add task from start of this hour until end of hour
-                partial_task = copy.deepcopy(task)
-                partial_task.set_start(i)
-                partial_task.set_realtime(complete - i)
-                data.append(partial_task)
-                runtimes.append(complete - i)
-            # task starts within this hour (but ends in a later hour) -- OVERHEAD
-            elif start > i and start < i + step and complete > i + step: 
-                # add task from start to end of this hour
-                partial_task = copy.deepcopy(task)
-                partial_task.set_complete(i + step)
-                partial_task.set_realtime(i + step - start)
-                data.append(partial_task)
-                if (i + step - start) > hour_overhead:  # get the overhead for the longest task that starts now but ends later
-                    hour_overhead = i + step - start
-                runtimes.append(i + step - start)
-            # task starts before hour and ends after this hour
-            elif start < i and complete > i + step:
-                partial_task = copy.deepcopy(task)
-                partial_task.set_start(i)
-                partial_task.set_complete(i + step)
-                partial_task.set_realtime(step)
-                data.append(partial_task)
-                runtimes.append(step)
-
-        tasks_by_hour[i] = data
-        overheads.append(hour_overhead)
-        i += step
-
-    # task_overall_runtime = sum(runtimes)
+    step = HOUR_MS
+    first_hour = start_hour - step  # start an hour before to be safe
+    hours = max((end_hour - first_hour) // step + 1, 0)
+    buckets = [[] for _ in range(hours)]
+    overheads = [0] * hours
+
+    # each task is only placed in the hours it overlaps, so cost follows tasks + task-hours
+    for task in tasks:
+        for (index, fragment, overhead) in get_task_fragments(task, first_hour, hours, step):
+            buckets[index].append(fragment)
+            if overhead > overheads[index]:  # get the overhead for the longest task that starts now but ends later
+                overheads[index] = overhead
+
+    tasks_by_hour = {first_hour + index * step: data for index, data in enumerate(buckets)}
 
     return (tasks_by_hour, overheads)
 
@@ -173,30 +218,193 @@ def get_tasks_by_hour(tasks):
     return get_tasks_by_hour_with_overhead(earliest_hh, latest_hh, tasks)
 
 
-def extract_tasks_by_hour(filename):
+def bucket_tasks_by_epoch_hour(tasks):
+    # hours are aligned to the epoch, so tasks can be bucketed before the workflow window is known
+    buckets = {}
+    overheads = {}
+    earliest = None
+    latest = None
+
+    for task in tasks:
+        start = int(task.get_start())
+        complete = int(task.get_complete())
+        earliest = start if earliest is None else min(earliest, start)
+        latest = complete if latest is None else max(latest, complete)
+
+        for (index, fragment, overhead) in get_task_fragments(task, 0, None):
+            buckets.setdefault(index, []).append(fragment)
+            if overhead > overheads.get(index, 0):
+                overheads[index] = overhead
+
+    return (buckets, overheads, earliest, latest)
+
+
+def get_tasks_by_hour_stream(tasks):
+    # single pass over an iterable of tasks, same result as get_tasks_by_hour
+    (buckets, hour_overheads, earliest, latest) = bucket_tasks_by_epoch_hour(tasks)
+
+    if earliest is None:
+        return ({}, [])
+
+    first_hour = to_closest_hour_ms(earliest) - HOUR_MS  # start an hour before to be safe
+    end_hour = to_closest_hour_ms(latest)
+    tasks_by_hour = {}
+    overheads = []
+
+    for hour in range(first_hour, end_hour + 1, HOUR_MS):
+        tasks_by_hour[hour] = buckets.get(hour // HOUR_MS, [])
+        overheads.append(hour_overheads.get(hour // HOUR_MS, 0))
+
+    return (tasks_by_hour, overheads)
+
+
+def iter_carbon_records(filename):
+    if len(filename.split(".")) > 1:
+        filename = filename.split(".")[-2]
+
+    for record in iter_trace_file(f"data/trace/{filename}.{FILE}"):
+        yield get_carbon_record(record)
+
+
+def get_file_digest(filepath):
+    digest = hashlib.sha256()
+
+    with open(filepath, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def load_cached_task_batch(filepath):
+    # a cache is only used when the trace has the same size, mtime and content as when it was written
+    cache_filepath = f"{filepath}.{CACHE_FILE}"
+    stat = os.stat(filepath)
+
+    if os.path.exists(cache_filepath):
+        try:
+            (batch, metadata) = load_carbon_record_batch(cache_filepath)
+
+            if metadata.get("version") == CACHE_VERSION and metadata.get("size") == stat.st_size \
+                    and metadata.get("mtime_ns") == stat.st_mtime_ns and metadata.get("digest") == get_file_digest(filepath):
+                return batch
+        except (OSError, ValueError, KeyError):
+            pass  # unreadable cache, fall back to parsing the trace
+
+    batch = make_carbon_record_batch(iter_trace_file(filepath))
+
+    try:
+        temp_filepath = f"{cache_filepath}.{os.getpid()}.tmp"
+
+        with open(temp_filepath, 'wb') as file:
+            save_carbon_record_batch(batch, file, version=CACHE_VERSION, size=stat.st_size,
+                                     mtime_ns=stat.st_mtime_ns, digest=get_file_digest(filepath))
+
+        os.replace(temp_filepath, cache_filepath)
+    except OSError:
+        pass  # caching is best effort, e.g. a read-only trace folder
+
+    return batch
+
+
+def extract_task_batch(filename, use_cache=True):
     if len(filename.split(".")) > 1:
         filename = filename.split(".")[-2]
 
-    records = parse_trace_file(f"data/trace/{filename}.{FILE}")
-    data_records = []
+    filepath = f"data/trace/{filename}.{FILE}"
 
-    for record in records:
-        data = get_carbon_record(record)
-        data_records.append(data)
+    if use_cache:
+        return load_cached_task_batch(filepath)
 
-    return get_tasks_by_hour(data_records)
+    return make_carbon_record_batch(iter_trace_file(filepath))
 
 
-# Estimate Energy Consumption using CCF Methodology
-def estimate_task_energy_consumption_ccf(task: CarbonRecord, min_watts, max_watts, memory_coefficient):
+def extract_tasks_by_hour(filename):
+    return get_tasks_by_hour_stream(extract_task_batch(filename))
+
+
+def get_ci_for_hour(ci, hour):
+    if isinstance(ci, float):
+        return ci
+
+    if isinstance(ci, CarbonIntensitySeries):
+        return ci.get_value(hour)
+
+    hour_ts = to_timestamp(hour)
+    month = str(hour_ts.month).zfill(2)
+    day = str(hour_ts.day).zfill(2)
+    hh = str(hour_ts.hour).zfill(2)
+    mm = str(hour_ts.minute).zfill(2)
+    ci_key = f'{month}/{day}-{hh}:{mm}'
+    return ci[ci_key]
+
+
+def get_task_columns(tasks):
+    if isinstance(tasks, CarbonRecordBatch):
+        return {
+            START: tasks.get_starts(),
+            COMPLETE: tasks.get_completes(),
+            REALTIME: tasks.get_realtimes(),
+            CPUS: tasks.get_core_counts().astype(np.float64),
+            CPU_USAGE: tasks.get_cpu_usages(),
+            MEMORY: tasks.get_memories()
+        }
+
+    return {
+        START: np.array([int(task.get_start()) for task in tasks], dtype=np.int64),
+        COMPLETE: np.array([int(task.get_complete()) for task in tasks], dtype=np.int64),
+        REALTIME: np.array([task.get_realtime() for task in tasks], dtype=np.float64),
+        CPUS: np.array([task.get_core_count() for task in tasks], dtype=np.float64),
+        CPU_USAGE: np.array([task.get_cpu_usage() for task in tasks], dtype=np.float64),
+        MEMORY: np.array([task.get_memory() for task in tasks], dtype=np.float64)
+    }
+
+
+def get_fragment_columns(tasks_by_hour, ci):
+    records = []
+    ci_vals = []
+    hours = []
+
+    for hour, tasks in tasks_by_hour.items():
+        if len(tasks) > 0:
+            ci_val = get_ci_for_hour(ci, hour)
+            records.extend(tasks)
+            ci_vals.extend([ci_val] * len(tasks))
+            hours.extend([hour] * len(tasks))
+
+    columns = get_task_columns(records)
+    columns[CI] = np.array(ci_vals, dtype=np.float64)
+    columns[HOUR] = np.array(hours, dtype=np.int64)
+
+    return (columns, records)
+
+
+def get_hourly_energy(tasks_by_hour, pue: float, min_watts, max_watts, memory_coefficient):
+    # energy inc. PUE (core and memory, kWh) of every hour in tasks_by_hour, footprint is then energy . ci
+    (columns, _) = get_fragment_columns(tasks_by_hour, 1.0)
+    (energy, memory) = estimate_energy_consumption_ccf(columns, min_watts, max_watts, memory_coefficient)
+    hours = np.array(list(tasks_by_hour.keys()), dtype=np.int64)
+    index = np.searchsorted(hours, columns[HOUR])
+
+    return (hours, np.bincount(index, weights=energy * pue + memory * pue, minlength=len(hours)))
+
+
+def sum_in_order(values):
+    # cumulative sum adds left to right, matching the scalar += totals exactly
+    if len(values) == 0:
+        return 0.0
+
+    return float(np.cumsum(values)[-1])
+
+
+# Estimate Energy Consumption using CCF Methodology (for columns of tasks)
+def estimate_energy_consumption_ccf(columns, min_watts, max_watts, memory_coefficient, bytes_per_gb=BYTES_PER_GB):
     # Time (h)
-    time = task.get_realtime() / 1000 / 3600  # convert from ms to h
-    # Number of Cores (int)
-    no_cores = task.get_core_count()
+    time = columns[REALTIME] / 1000 / 3600  # convert from ms to h
     # CPU Usage (%)
-    cpu_usage = task.get_cpu_usage() / (100.0 * no_cores)
+    cpu_usage = columns[CPU_USAGE] / (100.0 * columns[CPUS])
     # Memory (GB)
-    memory = task.get_memory() / 1073741824  # memory reported in bytes  https://www.nextflow.io/docs/latest/metrics.html 
+    memory = columns[MEMORY] / bytes_per_gb  # memory reported in bytes
     # Core Energy Consumption (without PUE)
     core_consumption = time * linear_power_model(cpu_usage, min_watts, max_watts) * 0.001  # convert from W to kW
     # Memory Power Consumption (without PUE)
@@ -205,44 +413,94 @@ def estimate_task_energy_consumption_ccf(task: CarbonRecord, min_watts, max_watt
     return (core_consumption, memory_consumption)
 
 
+def calculate_carbon_footprint_ccf_columns(columns, records, pue: float, min_watts, max_watts, memory_coefficient):
+    (energy, memory) = estimate_energy_consumption_ccf(columns, min_watts, max_watts, memory_coefficient)
+    energy_pue = energy * pue
+    memory_pue = memory * pue
+    footprint = (energy_pue + memory_pue) * columns[CI]
+
+    if isinstance(records, CarbonRecordBatch):
+        records.set_footprints(energy_pue, footprint, columns[CI])
+    elif records is not None:  # None when only the totals are wanted
+        for (task, task_energy, task_footprint, ci_val) in zip(records, energy_pue.tolist(), footprint.tolist(), columns[CI].tolist()):
+            task.set_energy(task_energy)
+            task.set_co2e(task_footprint)
+            task.set_avg_ci(ci_val)
+
+    return (sum_in_order(energy), sum_in_order(energy_pue), sum_in_order(memory), sum_in_order(memory_pue), sum_in_order(footprint))
+
+
 # Estimate Carbon Footprint using CCF Methodology
 def calculate_carbon_footprint_ccf(tasks_by_hour, ci, pue: float, min_watts, max_watts, memory_coefficient):
-    total_energy = 0.0
-    total_energy_pue = 0.0
-    total_memory_energy = 0.0
-    total_memory_energy_pue = 0.0
-    total_carbon_emissions = 0.0
-    records = []
+    (columns, records) = get_fragment_columns(tasks_by_hour, ci)
+    totals = calculate_carbon_footprint_ccf_columns(columns, records, pue, min_watts, max_watts, memory_coefficient)
 
-    for hour, tasks in tasks_by_hour.items():
-        if len(tasks) > 0:
-            if isinstance(ci, float):
-                ci_val = ci
-            else:
-                hour_ts = to_timestamp(hour)
-                month = str(hour_ts.month).zfill(2)
-                day = str(hour_ts.day).zfill(2)
-                hh = str(hour_ts.hour).zfill(2)
-                mm = str(hour_ts.minute).zfill(2)
-                ci_key = f'{month}/{day}-{hh}:{mm}'
-                ci_val = ci[ci_key] 
-
-            for task in tasks:
-                (energy, memory) = estimate_task_energy_consumption_ccf(task, min_watts, max_watts, memory_coefficient)
-                energy_pue = energy * pue
-                memory_pue = memory * pue
-                task_footprint = (energy_pue + memory_pue) * ci_val
-                task.set_energy(energy_pue)
-                task.set_co2e(task_footprint)
-                task.set_avg_ci(ci_val)
-                total_energy += energy
-                total_energy_pue += energy_pue
-                total_memory_energy += memory
-                total_memory_energy_pue += memory_pue
-                total_carbon_emissions += task_footprint
-                records.append(task)
-
-    return ((total_energy, total_energy_pue, total_memory_energy, total_memory_energy_pue, total_carbon_emissions), records)
+    return (totals, records)
+
+
+def get_time_weighted_ci(ci: CarbonIntensitySeries, starts, completes):
+    # mean ci over [start, complete] of each task, from a running integral of the series
+    values = ci.get_values()
+    step = ci.get_step()
+    missing = np.isnan(values)
+    integral = np.concatenate(([0.0], np.cumsum(np.where(missing, 0.0, values) * step)))
+    missing_count = np.concatenate(([0], np.cumsum(missing)))
+
+    if len(starts) > 0 and (starts.min() < ci.get_start() or completes.max() > ci.get_end()):
+        raise KeyError("tasks outside of the carbon intensity series")
+
+    first = np.minimum((starts - ci.get_start()) // step, len(values) - 1)
+    last = np.maximum(np.minimum((completes - ci.get_start() - 1) // step, len(values) - 1), first)
+
+    if np.any(missing_count[last + 1] - missing_count[first] > 0):
+        raise KeyError("tasks overlap intervals without carbon intensity data")
+
+    def integral_to(timestamps, index):
+        return integral[index] + np.where(missing[index], 0.0, values[index]) * (timestamps - ci.get_start() - index * step)
+
+    duration = completes - starts
+    total = integral_to(completes, last) - integral_to(starts, first)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(duration > 0, total / np.maximum(duration, 1), values[first])
+
+
+# Estimate Carbon Footprint using CCF Methodology, weighting each task by every ci interval it overlaps
+def calculate_carbon_footprint_ccf_integrated(tasks, ci, pue: float, min_watts, max_watts, memory_coefficient):
+    if not isinstance(tasks, CarbonRecordBatch):
+        tasks = list(tasks)
+
+    columns = get_task_columns(tasks)
+
+    if isinstance(ci, float):
+        columns[CI] = np.full(len(tasks), ci)
+    else:
+        columns[CI] = get_time_weighted_ci(ci, columns[START], columns[COMPLETE])
+
+    totals = calculate_carbon_footprint_ccf_columns(columns, tasks, pue, min_watts, max_watts, memory_coefficient)
+
+    return (totals, tasks)
+
+
+# Estimate Carbon Footprint using CCF Methodology, consuming tasks in batches
+def calculate_carbon_footprint_ccf_stream(tasks, ci, pue: float, min_watts, max_watts, memory_coefficient, output=None, batch_size=BATCH_SIZE, integrate=False):
+    totals = (0.0, 0.0, 0.0, 0.0, 0.0)
+
+    for batch in iter_batches(tasks, batch_size):
+        if integrate:
+            (batch_totals, records) = calculate_carbon_footprint_ccf_integrated(batch, ci, pue, min_watts, max_watts, memory_coefficient)
+        else:
+            (buckets, _, _, _) = bucket_tasks_by_epoch_hour(batch)
+            tasks_by_hour = {index * HOUR_MS: buckets[index] for index in sorted(buckets)}
+            (batch_totals, records) = calculate_carbon_footprint_ccf(tasks_by_hour, ci, pue, min_watts, max_watts, memory_coefficient)
+        totals = tuple(total + batch_total for (total, batch_total) in zip(totals, batch_totals))
+
+        # records are written per batch (hour order within a batch) rather than held until the end
+        if output is not None:
+            for record in records:
+                output.write(f"{record}\n")
+
+    return totals
 
 
 def get_hours(arr):
@@ -264,10 +522,14 @@ def check_if_float(value):
 
 
 def parse_arguments(args):
+    arguments = {}
+    arguments[STREAM] = STREAM_FLAG in args
+    arguments[INTEGRATE] = INTEGRATE_FLAG in args
+    args = [arg for arg in args if arg not in [STREAM_FLAG, INTEGRATE_FLAG]]
+
     if len(args) != 4 and len(args) != 6:
         print_usage_exit()
 
-    arguments = {}
     arguments[TRACE] = args[0]
 
     if check_if_float(args[1]):
@@ -315,22 +577,39 @@ def main(arguments):
         max_watts = arguments[MAX_WATTS]
 
     memory_coefficient = arguments[MEMORY_COEFFICIENT]
-    (tasks_by_hour, _) = extract_tasks_by_hour(workflow)
 
     summary = ""
     summary += "Carbon Footprint Trace:\n"
-    summary += f"- carbon-intensity: {arguments[CI]}\n"
+    summary += f"- carbon-intensity: {arguments.get(CI_NAME, arguments[CI])}\n"
     summary += f"- power-usage-effectiveness: {pue}\n"
     summary += f"- min to max watts: {min_watts}W to {max_watts}W\n"
     summary += f"- memory-power-draw: {memory_coefficient}\n"
 
+    if arguments.get(INTEGRATE, False):
+        summary += "- carbon-intensity-weighting: time-weighted over each interval a task overlaps\n"
+
     if isinstance(arguments[CI], float):
         ci = arguments[CI]
+        ci_name = str(int(ci))
+    elif isinstance(arguments[CI], CarbonIntensitySeries):  # already parsed by the caller
+        ci = arguments[CI]
+        ci_name = arguments[CI_NAME]
     else:
         ci_filename = f"data/intensity/{arguments[CI]}.{FILE}"
-        ci = parse_ci_intervals(ci_filename)
+        ci = parse_ci_series(ci_filename)
+        ci_name = arguments[CI]
+
+    if arguments.get(STREAM, False):
+        with open(f"output/{workflow}-{ci_name}-trace.csv", "w") as file:
+            file.write(f"{HEADERS}\n")
+            ccf = calculate_carbon_footprint_ccf_stream(iter_carbon_records(workflow), ci, pue, min_watts, max_watts, memory_coefficient, file,
+                                                        integrate=arguments.get(INTEGRATE, False))
+    elif arguments.get(INTEGRATE, False):
+        (ccf, records) = calculate_carbon_footprint_ccf_integrated(extract_task_batch(workflow), ci, pue, min_watts, max_watts, memory_coefficient)
+    else:
+        (tasks_by_hour, _) = extract_tasks_by_hour(workflow)
+        (ccf, records) = calculate_carbon_footprint_ccf(tasks_by_hour, ci, pue, min_watts, max_watts, memory_coefficient)
 
-    (ccf, records) = calculate_carbon_footprint_ccf(tasks_by_hour, ci, pue, min_watts, max_watts, memory_coefficient)
     ccf_energy, ccf_energy_pue, ccf_memory, ccf_memory_pue, ccf_carbon_emissions = ccf
 
     summary += "\nCloud Carbon Footprint Method:\n"
@@ -343,13 +622,10 @@ def main(arguments):
     print(f"Carbon Emissions (CCF): {ccf_carbon_emissions}gCO2e")
 
     # Report Summary
-    if isinstance(ci, float):
-        ci = str(int(ci))
-    else:
-        ci = arguments[CI]
+    write_summary_file("output", workflow + "-" + ci_name, summary)
 
-    write_summary_file("output", workflow + "-" + ci, summary)
-    write_trace_file("output", workflow + "-" + ci, records)
+    if not arguments.get(STREAM, False):
+        write_trace_file("output", workflow + "-" + ci_name, records)
 
     return (summary, ccf_carbon_emissions)
 
@@ -364,3 +640,4 @@ if __name__ == '__main__':
     # Parse Arguments
     args = sys.argv[1:]
     arguments = parse_arguments(args)
+    main(arguments)
@@ -1,6 +1,10 @@
+import os
 import sys
 import re
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from datetime import datetime
+from glob import glob
 
 
 # Constants
@@ -8,6 +12,7 @@ CHANGE_TIME = "change-time"
 CHANGE_TIME_MS = "change-time-ms"
 CHANGE_START = "change-start"
 CHANGE_START_MS = "change-start-ms"
+CHANGE_TIMES = "change-times"
 COMMANDS = [CHANGE_TIME, CHANGE_TIME_MS, CHANGE_START, CHANGE_START_MS]
 COMMAND = "command"
 TRACE_FILE = "trace-file"
@@ -17,49 +22,92 @@ NEW_START_MS = "new-start-ms"
 SHIFT_MS = "shift-ms"
 ORIGINAL_START_MS = "original-start-ms"
 OUT_FILE = "out-file"
+OFFSETS = "offsets"
+CONVERT_WORKERS = 4  # trace files converted at once in folder mode
+MAX_OPEN_FILES = 512  # shifted traces open at once across all conversions, below the usual limit of 1024 file descriptors
+dd_hh_mm_pattern = re.compile(r"^\d{2}-\d{2}-\d{2}$")
 
 
 # Functions
-def create_trace_file(trace_filepath, delim, offset, new_filename):
-    with open(trace_filepath, 'r') as file:
-        raw = file.readlines()
-        header = raw[0].split(delim)
-        data = raw[1:]
+def write_trace_files(trace_filepath, delim, offsets, new_filenames):
+    # one pass over the trace writes a shifted copy per offset, only start and complete are rewritten
+    with open(trace_filepath, 'r') as file, ExitStack() as stack:
+        outputs = [stack.enter_context(open(new_filename, 'w')) for new_filename in new_filenames]
+        header_line = file.readline()
+        header = header_line.split(delim)
+        start_i = header.index("start")
+        end_i = header.index("complete")
+        (first_i, last_i) = sorted([start_i, end_i])
+
+        for output in outputs:
+            output.write(header_line)
+
+        for row in file:
+            # fields after the last shifted one are kept as one untouched remainder
+            parts = row.split(delim, last_i + 1)
+            before = delim.join(parts[:first_i] + [""]) if first_i > 0 else ""
+            between = delim + delim.join(parts[first_i + 1:last_i] + [""]) if last_i > first_i + 1 else delim
+            after = delim + parts[last_i + 1] if len(parts) > last_i + 1 else ""
+            start = int(parts[start_i])
+            end = int(parts[end_i])
 
-    start_i = header.index("start")
-    end_i = header.index("complete")
+            for (output, offset) in zip(outputs, offsets):
+                values = {start_i: str(start + offset), end_i: str(end + offset)}
+                output.write(f"{before}{values[first_i]}{between}{values[last_i]}{after}")
 
-    with open(new_filename, 'w') as file:
-        file.write(delim.join(header))
 
-        for row in data:
-            parts = row.split(delim)
-            start = int(parts[start_i])
-            end = int(parts[end_i])
-            new_start = start + offset
-            new_end = end + offset
-            parts[start_i] = str(new_start)
-            parts[end_i] = str(new_end)
-            new_row = delim.join(parts)
-            file.write(f"{new_row}")
+def create_trace_files(trace_filepath, delim, offsets, new_filenames, max_open=MAX_OPEN_FILES):
+    # offsets beyond max_open are written by further passes over the trace, so the outputs never exhaust the file descriptors
+    for i in range(0, len(new_filenames), max_open):
+        write_trace_files(trace_filepath, delim, offsets[i:i + max_open], new_filenames[i:i + max_open])
+
+    return [new_filename.split("/")[-1] for new_filename in new_filenames]
 
+
+def create_trace_file(trace_filepath, delim, offset, new_filename):
+    create_trace_files(trace_filepath, delim, [offset], [new_filename])
     print(f"[Convertor] Find converted trace file [{new_filename}]")
 
     return new_filename.split("/")[-1]
 
 
+def get_shifted_filename(folder, name, offset):
+    return f"{folder}/{name}~{int(offset)}.csv"
+
+
+def create_shifted_trace_files(trace_filepath, delim, offsets, out_folder, out_name=None, max_open=MAX_OPEN_FILES):
+    name = out_name or os.path.splitext(os.path.basename(trace_filepath))[0]
+    new_filenames = [get_shifted_filename(out_folder, name, offset) for offset in offsets]
+    return create_trace_files(trace_filepath, delim, offsets, new_filenames, max_open)
+
+
+def create_shifted_trace_folder(folder, delim, offsets, out_folder, workers=CONVERT_WORKERS):
+    # every trace in folder is shifted by every offset, traces are converted on a thread pool as the work is mostly I/O
+    os.makedirs(out_folder, exist_ok=True)
+    traces = sorted(glob(os.path.join(folder, "*.csv")))
+    max_open = max(MAX_OPEN_FILES // workers, 1)  # the budget is shared by the traces converted at once
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        converted = pool.map(lambda trace: create_shifted_trace_files(trace, delim, offsets, out_folder, None, max_open), traces)
+        return [filename for filenames in converted for filename in filenames]
+
+
 def print_usage_exit():
     usage = "[Convertor] $ Expected Use - Arguments Format: <change-command> <trace-file-name.end> <delimiter> <direction|new-start> <shift|original-start> <output-name>"
     example_time = "[Convertor] $ adjust file by days-hours-minutes: change-time test.csv , + 00-06-30 changed"
     example_stamp = "[Convertor] $ adjust file by ms: change-ms test.csv , + 23400000 changed"
     example_start = "[Convertor] $ adjust file start time using date: change-start test.csv , 2024-03-12:09-00 2024-01-01:10-00 changed"
     example_start_ms = "[Convertor] $ adjust file start time using ms: change-start-ms test.csv , 2024-03-12:09-00 1701083201729 changed"
+    example_times = "[Convertor] $ one file per offset (list or first:last:step, ms or +/-dd-hh-mm): change-times test.csv , -00-06-00:+00-06-00:00-01-00 changed"
+    example_folder = "[Convertor] $ every trace in a folder of data/trace: change-times runs/ , -3600000,0,3600000 changed"
 
     print(usage)
     print(example_time)
     print(example_stamp)
     print(example_start)
     print(example_start_ms)
+    print(example_times)
+    print(example_folder)
 
     exit(-1)
 
@@ -78,15 +126,54 @@ def to_timestamp_from_dd_hh_mm(time):
         return (stamp.day * 86400000) + (stamp.hour * 3600000) + (stamp.minute * 60000)
 
 
+def to_offset_ms(value):
+    # signed ms or signed dd-hh-mm
+    sign = -1 if value.startswith("-") else 1
+    value = value.lstrip("+-")
+
+    if re.match(dd_hh_mm_pattern, value) is None:
+        return sign * int(value)
+
+    return sign * to_timestamp_from_dd_hh_mm(value)
+
+
+def parse_offsets(value):
+    if ":" in value:
+        (first, last, step) = [to_offset_ms(part) for part in value.split(":")]
+        return list(range(first, last + 1, step))
+
+    return [to_offset_ms(part) for part in value.split(",")]
+
+
+def validate_sweep_arguments(args):
+    if len(args) != 5:
+        print_usage_exit()
+
+    try:
+        offsets = parse_offsets(args[3])
+    except ValueError:
+        print_usage_exit()
+
+    return {
+        COMMAND: args[0],
+        TRACE_FILE: f"data/trace/{args[1]}",
+        DELIMITER: args[2],
+        OFFSETS: offsets,
+        OUT_FILE: args[4]
+    }
+
+
 def validate_arguments(args):
+    if len(args) > 0 and args[0] == CHANGE_TIMES:
+        return validate_sweep_arguments(args)
+
     if len(args) != 6:
         print_usage_exit()
 
     if args[0] not in COMMANDS:
         print_usage_exit()
 
-    date_pattern = re.compile("^\d{4}-\d{2}-\d{2}:\d{2}-\d{2}$")
-    dd_hh_mm_pattern = re.compile("^\d{2}-\d{2}-\d{2}$")
+    date_pattern = re.compile(r"^\d{4}-\d{2}-\d{2}:\d{2}-\d{2}$")
 
     if args[3] != "+" and args[3] != "-":
         if re.match(date_pattern, args[3]) is None and re.match(dd_hh_mm_pattern, args[4]) is None:
@@ -123,8 +210,25 @@ def validate_arguments(args):
     }
 
 
+def convert_sweep(settings):
+    filepath = settings[TRACE_FILE]
+
+    if os.path.isdir(filepath):
+        converted = create_shifted_trace_folder(filepath, settings[DELIMITER], settings[OFFSETS], f"data/trace/{settings[OUT_FILE]}")
+        print(f"[Convertor] Find {len(converted)} converted trace files [data/trace/{settings[OUT_FILE]}/<trace>~<offset-ms>.csv]")
+    else:
+        converted = create_shifted_trace_files(filepath, settings[DELIMITER], settings[OFFSETS], "data/trace", settings[OUT_FILE])
+        print(f"[Convertor] Find {len(converted)} converted trace files [data/trace/{settings[OUT_FILE]}~<offset-ms>.csv]")
+
+    return converted
+
+
 def convert(settings):
     command = settings[COMMAND]
+
+    if command == CHANGE_TIMES:
+        return convert_sweep(settings)
+
     filepath = settings[TRACE_FILE]
     filename = filepath.split("/")[2].split(".")
     delimiter = settings[DELIMITER]
@@ -1,78 +1,56 @@
 # Imports
 import sys
 import os
-from src.scripts.Convertor import convertor
-from src.scripts.CarbonFootprint import get_carbon_footprint
+from src.scripts.Convertor import create_trace_files
+from src.scripts.CarbonFootprint import parse_ci_series, extract_task_batch, get_tasks_by_hour, calculate_carbon_footprint_ccf, \
+    get_hourly_energy, get_task_columns, estimate_energy_consumption_ccf, sum_in_order, HOUR_MS, START, COMPLETE
+from math import gcd
+import numpy as np
 
 
 # Constants
-SHIFT_BY_12 = "00-12-00"
-SHIFT_BY_6 = "00-06-00"
-DEFAULT_SHIFT = SHIFT_BY_12
-CMD_SHIFT = "change-time trace delim direction shift filename"
 FORWARD = "+"
 BACKWARD = "-"
 TRACE = "trace"
 CI = "ci"
 CONFIG = "config"
-DELIM = "delim"
-DIRECTION = "direction"
 SHIFT = "shift"
-TRACE_FILENAME = "filename"
 MIN_WATTS = "min-watts"
 MAX_WATTS = "max-watts"
+EXPORT_TRACES = "export-traces"
+EXPORT_TRACES_FLAG = "--export-traces"
+INTEGRATE = "integrate"
+INTEGRATE_FLAG = "--integrate"
+STEP_MINUTES = "step-minutes"
+STEP_FLAG = "--step="
+MINUTE_MS = 60 * 1000
+FFT_THRESHOLD = 1000000  # direct correlation above this many multiply-adds is slower than the fft
+SHIFT_PUE = 1.0
+SHIFT_MEMORY_COEFFICIENT = 0.392
 
 
 # Functions
-def shift_trace(trace, delim, shift=DEFAULT_SHIFT):
-    cmd_shift_forward = CMD_SHIFT\
-            .replace(TRACE, trace)\
-            .replace(DELIM, delim)\
-            .replace(DIRECTION, FORWARD)\
-            .replace(SHIFT, shift)\
-            .replace(TRACE_FILENAME, f"{trace.split('.')[0]}~{shift}")
-    cmd_shift_backward = CMD_SHIFT\
-            .replace(TRACE, trace)\
-            .replace(DELIM, delim)\
-            .replace(DIRECTION, BACKWARD)\
-            .replace(SHIFT, shift)\
-            .replace(TRACE_FILENAME, f"{trace.split('.')[0]}~{shift}")
-
-    trace_forward = convertor(cmd_shift_forward)
-    trace_backward = convertor(cmd_shift_backward)
-
-    return (trace_backward, trace, trace_forward)
-
+def get_output_folder(trace, ci): 
+    trace_name = trace.split(".")[-2]
+    ci_name = ci.split(".")[-2]
 
-def calculate_footprint(trace, ci, min_watts, max_watts):
-    command = f"{trace} {ci} {min_watts} {max_watts} 1.0 0.392"
-    return get_carbon_footprint(command)
+    return f"output/explorer-{trace_name}-{ci_name}"
 
 
-def report_summary(folder, settings, results, shift):
+def report_shift_table(folder, settings, results):
     file_prefix = folder.split("/")[1]
 
-    with open(folder + f"/{file_prefix}~summary.txt", "w+") as file:
-        for (trace, (summary, cf)) in results:
-            file.write(f"Trace Report for [{trace}] using CI Data [{settings[CI]}] with Shift [{shift}]\n")
-            file.write(f"{summary}\n\n")
+    with open(folder + f"/{file_prefix}~shifts.csv", "w+") as file:
+        file.write("trace,ci,shift-minutes,energy,energy-pue,memory,memory-pue,co2e\n")
 
-    with open(folder + f"/{file_prefix}~footprint.csv", "w+") as file:
-        for (trace, (_, cf)) in results:
-            file.write(f"{trace},{cf}\n")
+        for (minutes, (energy, energy_pue, memory, memory_pue, co2e)) in results:
+            file.write(f"{settings[TRACE]},{settings[CI]},{minutes},{energy},{energy_pue},{memory},{memory_pue},{co2e}\n")
 
-    print(f"[Explorer] Finished - View Results in [{folder}/summary.txt]")
-
-
-def get_output_folder(trace, ci): 
-    trace_name = trace.split(".")[-2]
-    ci_name = ci.split(".")[-2]
-
-    return f"output/explorer-{trace_name}-{ci_name}"
+    print(f"[Explorer] Finished - View Results in [{folder}/{file_prefix}~shifts.csv]")
 
 
 def print_usage_exit():
-    usage = "[Explorer] Expected Usage: py explorer.py <trace-file> <ci-file> <config> <shift> <min-watts> <max-watts>"
+    usage = "[Explorer] Expected Usage: py explorer.py <trace-file> <ci-file> <config> <shift> <min-watts> <max-watts> <? --step=minutes> <? --integrate> <? --export-traces>"
     example = "[Explorer] Example Use: py explorer.py test.csv ci-20240218.csv default 12 30 80"
     print(usage)
     print(example)
@@ -80,10 +58,18 @@ def print_usage_exit():
 
 
 def parse_arguments(arguments):
+    export_traces = EXPORT_TRACES_FLAG in arguments
+    integrate = INTEGRATE_FLAG in arguments
+    steps = [int(argument[len(STEP_FLAG):]) for argument in arguments if argument.startswith(STEP_FLAG)]
+    arguments = [argument for argument in arguments if argument not in [EXPORT_TRACES_FLAG, INTEGRATE_FLAG] and not argument.startswith(STEP_FLAG)]
+
     if len(arguments) != 6:
         print_usage_exit()
 
     return {
+        EXPORT_TRACES: export_traces,
+        INTEGRATE: integrate,
+        STEP_MINUTES: steps[-1] if len(steps) > 0 else 60,
         TRACE: arguments[0].strip(),
         CI: arguments[1].strip(),
         CONFIG: arguments[2].strip(),
@@ -93,36 +79,109 @@ def parse_arguments(arguments):
     }
 
 
-def shift_trace_both_directions_by_h(trace, delim, shift_by, ci, min_watts, max_watts):
-    backward_traces = []
-    forward_traces = []
+def get_shift_label(hours, minutes=0):
+    minutes += hours * 60
+    days = minutes // (24 * 60)
+    hours = (minutes // 60) % 24
+    return f"{str(days).zfill(2)}-{str(hours).zfill(2)}-{str(minutes % 60).zfill(2)}"
 
-    for i in range(1, shift_by + 1):
-        shift = ''
 
-        if i >= 24:
-            days = i // 24
-            hours = i - (24 * days)
-            shift = f"{str(days).zfill(2)}-{str(hours).zfill(2)}-00"
-        else:
-            shift = f"00-{str(i).zfill(2)}-00"
+def export_shifted_traces(trace, delim, shifts):
+    # every shifted trace is written in one pass over the trace, shifts in minutes
+    trace_name = trace.split('.')[0]
+    shifts = [minutes for minutes in shifts if minutes != 0]
+    filenames = [f"data/trace/{trace_name}~{FORWARD if minutes > 0 else BACKWARD}{get_shift_label(0, abs(minutes))}.csv" for minutes in shifts]
+    create_trace_files(f"data/trace/{trace}", delim, [minutes * MINUTE_MS for minutes in shifts], filenames)
 
-        (trace_bwd, _, trace_fwd) = shift_trace(trace, delim, shift)
-        backward_traces.insert(0, trace_bwd)
-        forward_traces.append(trace_fwd)
+    for filename in filenames:
+        print(f"[Convertor] Find converted trace file [{filename}]")
 
-    footprints = []
-    ci = ci.split('.')[0]
 
-    for trace_bwd in backward_traces:
-        footprints.append((trace_bwd, calculate_footprint(trace_bwd, ci, min_watts, max_watts)))
+def correlate_valid(signal, kernel):
+    # out[j] = sum(kernel[k] * signal[j + k]) for every j where kernel fits inside signal
+    if len(signal) * len(kernel) <= FFT_THRESHOLD:
+        return np.correlate(signal, kernel, mode='valid')
 
-    footprints.append((trace, calculate_footprint(trace, ci, min_watts, max_watts)))
+    size = len(signal) + len(kernel) - 1
+    spectrum = np.fft.rfft(signal, size) * np.fft.rfft(kernel[::-1], size)
+    return np.fft.irfft(spectrum, size)[len(kernel) - 1:len(signal)]
 
-    for trace_fwd in forward_traces:
-        footprints.append((trace_fwd, calculate_footprint(trace_fwd, ci, min_watts, max_watts)))
 
-    return footprints
+def get_shift_footprints(weights, ci_values, shifts, stride):
+    # footprint for each shift in bins, ci_values holds len(weights) + 2 * shifts * stride bins around the workflow
+    missing = np.isnan(ci_values)
+    footprints = correlate_valid(np.where(missing, 0.0, ci_values), weights)[::stride]
+
+    # shifts that would place energy on a bin without ci data are reported as nan
+    uncovered = correlate_valid(missing.astype(np.float64), (weights != 0).astype(np.float64))[::stride]
+    footprints[uncovered > 0.5] = np.nan
+
+    return footprints[:2 * shifts + 1]
+
+
+def get_binned_task_energy(starts, completes, energy, origin, size):
+    # spread each task's energy evenly over [start, complete] into bins of width size from origin
+    first = (starts - origin) // size
+    last = np.maximum((completes - origin - 1) // size, first)
+    duration = completes - starts
+    bins = np.zeros(int(last.max()) + 1 if len(last) > 0 else 0)
+
+    instant = duration <= 0
+    np.add.at(bins, first[instant], energy[instant])
+
+    spread = ~instant
+    (first, last, starts, completes) = (first[spread], last[spread], starts[spread], completes[spread])
+    density = energy[spread] / duration[spread]
+    single = first == last
+    np.add.at(bins, first[single], density[single] * (completes[single] - starts[single]))
+
+    multi = ~single
+    np.add.at(bins, first[multi], density[multi] * (origin + (first[multi] + 1) * size - starts[multi]))
+    np.add.at(bins, last[multi], density[multi] * (completes[multi] - origin - last[multi] * size))
+
+    # whole bins in between are filled with a difference array
+    inner = np.zeros(len(bins) + 1)
+    np.add.at(inner, first[multi] + 1, density[multi] * size)
+    np.add.at(inner, last[multi], -density[multi] * size)
+
+    return bins + np.cumsum(inner)[:-1]
+
+
+def explore_shifts_by_correlation(trace, shift_by, ci, min_watts, max_watts, step_minutes=60, integrate=False):
+    # footprint of every start offset within shift_by hours, in steps of step_minutes, from one correlation
+    # hourly: matches the footprint of each shifted trace (ci at the top of each hour), only whole hour steps
+    # integrate: tasks weighted by every ci interval they overlap, as with CarbonFootprint --integrate
+    batch = extract_task_batch(trace)
+    ci = parse_ci_series(f"data/intensity/{ci.split('.')[0]}.csv")
+    step = step_minutes * MINUTE_MS
+    shifts = (shift_by * HOUR_MS) // step
+
+    if not integrate:
+        if step % HOUR_MS != 0:
+            raise ValueError("hourly shifts need a step of whole hours, use integrate for finer steps")
+
+        (tasks_by_hour, _) = get_tasks_by_hour(batch)
+        (totals, _) = calculate_carbon_footprint_ccf(tasks_by_hour, 1.0, SHIFT_PUE, min_watts, max_watts, SHIFT_MEMORY_COEFFICIENT)
+        (hours, energy) = get_hourly_energy(tasks_by_hour, SHIFT_PUE, min_watts, max_watts, SHIFT_MEMORY_COEFFICIENT)
+        stride = step // HOUR_MS
+        margin = shifts * stride
+        tops = hours[0] + np.arange(-margin, len(hours) + margin, dtype=np.int64) * HOUR_MS
+        footprints = get_shift_footprints(energy, ci.get_values_at(tops, strict=False), shifts, stride)
+    else:
+        columns = get_task_columns(batch)
+        (core, memory) = estimate_energy_consumption_ccf(columns, min_watts, max_watts, SHIFT_MEMORY_COEFFICIENT)
+        totals = (sum_in_order(core), sum_in_order(core * SHIFT_PUE), sum_in_order(memory), sum_in_order(memory * SHIFT_PUE))
+        size = gcd(step, ci.get_step())
+        starts = columns[START]
+        origin = ci.get_start() + ((int(starts.min()) - ci.get_start()) // size) * size  # bins line up with ci intervals
+        weights = get_binned_task_energy(starts, columns[COMPLETE], core * SHIFT_PUE + memory * SHIFT_PUE, origin, size)
+        stride = step // size
+        margin = shifts * stride
+        centres = origin + np.arange(-margin, len(weights) + margin, dtype=np.int64) * size
+        footprints = get_shift_footprints(weights, ci.get_values_at(centres, strict=False), shifts, stride)
+
+    # energy does not change with a shift, only the footprint does
+    return [((j - shifts) * step_minutes, tuple(totals[:4]) + (float(footprint),)) for (j, footprint) in enumerate(footprints)]
 
 
 # Shift over 2x hour period
@@ -133,5 +192,10 @@ if __name__ == "__main__":
     output_folder = get_output_folder(settings[TRACE], settings[CI])
     os.makedirs(output_folder, exist_ok=True)
 
-    footprints = shift_trace_both_directions_by_h(settings[TRACE], ",", settings[SHIFT], settings[CI], settings[MIN_WATTS], settings[MAX_WATTS])
-    report_summary(output_folder, settings, footprints, "custom")
+    results = explore_shifts_by_correlation(settings[TRACE], settings[SHIFT], settings[CI], settings[MIN_WATTS], settings[MAX_WATTS],
+                                            settings[STEP_MINUTES], settings[INTEGRATE])
+
+    if settings[EXPORT_TRACES]:
+        export_shifted_traces(settings[TRACE], ",", [minutes for (minutes, _) in results])
+
+    report_shift_table(output_folder, settings, results)
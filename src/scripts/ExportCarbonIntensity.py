@@ -3,12 +3,12 @@
 
 
 # Imports
+import os
 import sys
 import re
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-from datetime import date, timedelta
 
 
 # Constants
@@ -33,62 +33,87 @@ FR = "fr"
 DE = "de"
 CA = "ca"
 RECOGNISED_DFS = [UK, FR, DE, CA]
+REGION_FILES = {
+    UK: ('data/emaps/GB_2023_hourly.csv', '%d/%m/%Y %H:%M'),
+    FR: ('data/emaps/FR_2023_hourly.csv', '%Y-%m-%d %H:%M:%S'),
+    DE: ('data/emaps/DE_2023_hourly.csv', '%Y-%m-%d %H:%M:%S'),
+    CA: ('data/emaps/US-CAL-CISO_2023_hourly.csv', '%Y-%m-%d %H:%M:%S'),
+}
+REGION_COLUMNS = ["date", "start", "end", "actual"]
+CACHE_FILE = "npz"
+CACHE_VERSION = 1
 
 
 # Functions
-def prepare_region_gb(filepath, date_sep="-"):
-    df = pd.read_csv(filepath, names=cols, header=None, skiprows=1)
-    df['weekday'] = weekdays_vals
-    df[['date', 'hour']] = df['datetime_utc'].str.split(' ', n=1, expand=True)
-    df[['day', 'month', 'year']] = df['date'].str.split(date_sep, n=2, expand=True)
-    df.drop(['country', 'zone', 'source', 'estimated', 'method', 'year'], inplace=True, axis=1)
-    return df
+def read_region(filepath, datetime_format):
+    # columns as exported, each hour ends at the next ("00:00" after "23:00" only where times have no seconds)
+    df = pd.read_csv(filepath, names=cols, header=None, skiprows=1, usecols=['datetime_utc', 'ci_direct'])
+    parts = df['datetime_utc'].str.split(' ', n=1, expand=True)
+    start = parts[1]
+    end = np.where(start == "23:00", "00:00", (start.str[:2].astype(int) + 1).astype(str).str.zfill(2) + ":00")
 
+    return {
+        "timestamp": pd.to_datetime(df['datetime_utc'], format=datetime_format).to_numpy(dtype='datetime64[ns]').astype(np.int64),
+        "date": parts[0].to_numpy(dtype=str),
+        "start": start.to_numpy(dtype=str),
+        "end": end.astype(str),
+        "actual": df['ci_direct'].to_numpy(dtype=np.float64),
+    }
 
-def prepare_region(filepath, date_sep="-"):
-    df = pd.read_csv(filepath, names=cols, header=None, skiprows=1)
-    df['weekday'] = weekdays_vals
-    df[['date', 'hour']] = df['datetime_utc'].str.split(' ', n=1, expand=True)
-    df[['year', 'month', 'day']] = df['date'].str.split(date_sep, n=2, expand=True)
-    df.drop(['country', 'zone', 'source', 'estimated', 'method', 'year'], inplace=True, axis=1)
-    return df
 
+def load_cached_region(filepath, datetime_format):
+    # a cache is only used when the emaps file has the same size and mtime as when it was written
+    cache_filepath = f"{filepath}.{CACHE_FILE}"
+    stat = os.stat(filepath)
 
-def get_end(time):
-    if str(time) == "23:00":
-        return "00:00"
-    else:
-        hour = str(int(str(time).split(":")[0]) + 1).zfill(2)
-        return f"{hour}:00"
+    if os.path.exists(cache_filepath):
+        try:
+            with np.load(cache_filepath, allow_pickle=False) as data:
+                if data["version"].item() == CACHE_VERSION and data["size"].item() == stat.st_size and data["mtime_ns"].item() == stat.st_mtime_ns:
+                    return {key: data[key] for key in ["timestamp"] + REGION_COLUMNS}
+        except (OSError, ValueError, KeyError):
+            pass  # unreadable cache, fall back to parsing the emaps file
 
+    columns = read_region(filepath, datetime_format)
 
-def get_data_for_day(df, day_of_month):
-    data = df.groupby(['month', 'day'], sort=False, as_index=False)
-    data_day = data.get_group(day_of_month)
-    data_day["start"] = data_day["hour"]
-    data_day["end"] = data_day["start"].apply(get_end)
-    data_day["actual"] = data_day["ci_direct"]
-    data_day.drop(["hour", "ci_direct"], inplace=True, axis=1)
-    data_day = data_day[["date", "start", "end", "actual"]]
+    try:
+        temp_filepath = f"{cache_filepath}.{os.getpid()}.tmp"
 
-    return data_day
+        with open(temp_filepath, 'wb') as file:
+            np.savez(file, version=CACHE_VERSION, size=stat.st_size, mtime_ns=stat.st_mtime_ns, **columns)
 
+        os.replace(temp_filepath, cache_filepath)
+    except OSError:
+        pass  # caching is best effort, e.g. a read-only data folder
+
+    return columns
 
-def fetch_carbon_intensity_data(intervals):
-    return []
 
+# regions are only loaded when first exported, then kept for later exports
+loaded_regions = {}
 
-def get_days(start, end):
-    start_day = date(int(start[YEAR]), int(start[MONTH]), int(start[DAY]))
-    end_day = date(int(end[YEAR]), int(end[MONTH]), int(end[DAY]))
-    iter_day = start_day
-    days = []
 
-    while iter_day <= end_day:
-        days.append((str(iter_day.month).zfill(2), str(iter_day.day).zfill(2)))
-        iter_day += timedelta(days=1)
+def load_region(region):
+    if region not in loaded_regions:
+        (filepath, datetime_format) = REGION_FILES[region]
+        columns = load_cached_region(filepath, datetime_format)
+        df = pd.DataFrame({key: columns[key] for key in REGION_COLUMNS}, index=pd.DatetimeIndex(columns["timestamp"].astype('datetime64[ns]')))
+        loaded_regions[region] = df.sort_index(kind='stable')
 
-    return days
+    return loaded_regions[region]
+
+
+def get_data_for_days(df, start, end):
+    # whole days from start to end (inclusive), one slice of the datetime index
+    first = pd.Timestamp(int(start[YEAR]), int(start[MONTH]), int(start[DAY]))
+    last = pd.Timestamp(int(end[YEAR]), int(end[MONTH]), int(end[DAY])) + pd.Timedelta(days=1)
+    (i, j) = df.index.searchsorted([first, last])
+
+    return df.iloc[i:j]
+
+
+def fetch_carbon_intensity_data(intervals):
+    return []
 
 
 def write_carbon_intensity_data(data, settings):
@@ -103,25 +128,13 @@ def write_carbon_intensity_data(data, settings):
     return filepath + filename
 
 
-def export_carbon_intensity(dfs, settings):
-    (uk, fr, de, ca) = dfs
-
-    if settings[DF] == UK:
-        df = uk
-    elif settings[DF] == DE:
-        df = de
-    elif settings[DF] == FR:
-        df = fr
-    elif settings[DF] == CA:
-        df = ca
+def export_carbon_intensity(settings):
+    data = get_data_for_days(load_region(settings[DF]), settings[START], settings[END])
 
-    days_to_check = get_days(settings[START], settings[END])
-    data = []
+    if len(data) == 0:
+        raise ValueError(f"no carbon intensity data for {settings[DF]} between the given dates")
 
-    for day in days_to_check:
-        data.append(get_data_for_day(df, day))
-
-    output_file = write_carbon_intensity_data(data, settings)
+    output_file = write_carbon_intensity_data([data], settings)
     print(f"[ExportCarbonIntensity] Successfully Exported CI Data to [{output_file}]")
 
     return output_file
@@ -199,28 +212,13 @@ def parse_arguments(arguments):
     }
 
 
-def setup_data():
-    # UK Data
-    uk_ci_df = prepare_region_gb('data/emaps/GB_2023_hourly.csv', '/')
-    # France Data
-    fr_ci_df = prepare_region('data/emaps/FR_2023_hourly.csv')
-    # Germany Data
-    de_ci_df = prepare_region('data/emaps/DE_2023_hourly.csv')
-    # California Data
-    ca_ci_df = prepare_region('data/emaps/US-CAL-CISO_2023_hourly.csv')
-
-    return (uk_ci_df, fr_ci_df, de_ci_df, ca_ci_df)
-
-
 def export_carbon_intensity_cmd(command):
     settings = parse_command(command)
-    dfs = setup_data()
-    return export_carbon_intensity(dfs, settings)
+    return export_carbon_intensity(settings)
 
 
 # Main Script
 if __name__ == "__main__":
     args = sys.argv[1:]
     settings = parse_arguments(args)
-    dfs = setup_data()
-    export_carbon_intensity(dfs, settings)    
+    export_carbon_intensity(settings)    
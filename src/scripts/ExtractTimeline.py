@@ -1,5 +1,6 @@
 from src.models.TraceRecord import TraceRecord
 from src.models.CarbonRecord import CarbonRecord, HEADERS
+from src.scripts.CarbonFootprint import iter_trace_file
 import sys
 import configparser
 import datetime as time
@@ -13,26 +14,19 @@ DEFAULT = "default"
 FILE = "csv"
 DELIMITER = ","
 MEMORY_COEFFICIENT = 0.392  # CCF Average (See Website)
+HOUR_MS = 60 * 60 * 1000  # 60 minutes in ms
+MAX_TICKS = 12  # hour labels are thinned out beyond this so they stay readable
+OUTPUT_FLAG = "--output="
 
 
 # Functions
 def parse_trace_file(filepath):
-    with open(filepath, 'r') as file:
-        lines = [line.rstrip() for line in file]
-
-    header = lines[0]
-    records = []
-
-    for line in lines[1:]:
-        trace_record = TraceRecord(header, line, DELIMITER)
-        records.append(trace_record)
-
-    return records
+    return list(iter_trace_file(filepath))
 
 
 def print_usage_exit():
-    usage = "carbon-footprint $ python -m src.scripts.ExtractTimeline <trace-file-name>"
-    example = "carbon-footprint $ python -m src.scripts.ExtractTimeline test"
+    usage = "carbon-footprint $ python -m src.scripts.ExtractTimeline <trace-file-name> <? --output=timeline.png|svg>"
+    example = "carbon-footprint $ python -m src.scripts.ExtractTimeline test --output=output/test-timeline.png"
 
     print(usage)
     print(example)
@@ -55,62 +49,71 @@ def get_timeline_data(record):
 
 
 def get_tasks_by_hour(start_hour, end_hour, tasks):
-    tasks_by_hour = {}
+    step = HOUR_MS
+    first_hour = start_hour - step  # start an hour before to be safe
+    hours = max((end_hour - first_hour) // step + 1, 0)
+    tasks_by_hour = {first_hour + index * step: [] for index in range(hours)}
 
-    step = 60 * 60 * 1000  # 60 minutes in ms
-    i = start_hour - step  # start an hour before to be safe
+    # each task is only checked against the hours it can overlap (one hour either side covers boundary tasks)
+    for task in tasks:
+        start = int(task["start"])
+        complete = int(task["complete"])
+        first_index = max((min(start, complete) - first_hour) // step - 1, 0)
+        last_index = min((max(start, complete) - first_hour) // step, hours - 1)
 
-    while i <= end_hour:
-        data = [] 
+        for index in range(first_index, last_index + 1):
+            i = first_hour + index * step
+            data = tasks_by_hour[i]
 
-        for task in tasks: 
             # full task is within this hour
-            if int(task["start"]) >= i and int(task["complete"]) <= i + step:
+            if start >= i and complete <= i + step:
                 data.append(task)
             # task ends within this hour (but starts in a previous hour)
-            elif int(task["complete"]) > i and int(task["complete"]) <= i + step and int(task["start"]) < i:
+            elif complete > i and complete <= i + step and start < i:
                 # add task from start of this hour until end of hour
                 partial_task = task.copy()
                 partial_task["start"] = i
                 data.append(partial_task)
             # task starts within this hour (but ends in a later hour)
-            elif int(task["start"]) > i and int(task["start"]) <= i + step and int(task["complete"]) > i + step: 
+            elif start > i and start <= i + step and complete > i + step:
                 # add task from start to end of this hour
                 partial_task = task.copy()
                 partial_task["complete"] = i + step
                 data.append(partial_task)
             # task starts before hour and ends after this hour
-            elif int(task["start"]) < i and int(task["complete"]) > i + step:
+            elif start < i and complete > i + step:
                 partial_task = task.copy()
                 partial_task["start"] = i
                 partial_task["end"] = i + step
                 data.append(partial_task)
 
-        tasks_by_hour[i] = data
-        i += step
-
     return tasks_by_hour
 
 
-def plot_task_timeline(tasks):
-    # y_pos = np.arange(len(tasks))
-    x1_pos = []
-    ends = []
-    widths = []
-    labels = []
+def merge_intervals(starts, ends, gap):
+    # union of [start, end) intervals, intervals closer than gap (e.g. one pixel) are drawn as one bar
+    order = np.argsort(starts, kind="stable")
+    starts = starts[order]
+    ends = np.maximum.accumulate(ends[order])
+    breaks = np.flatnonzero(starts[1:] > ends[:-1] + gap) + 1
+    firsts = np.concatenate(([0], breaks))
+    lasts = np.concatenate((breaks - 1, [len(starts) - 1]))
+    return (starts[firsts], ends[lasts])
 
-    for task in tasks:
-        x1_pos.append(int(task["start"]))
-        width = int(task["complete"]) - int(task["start"])
-        ends.append(int(task["complete"]))
-        widths.append(width)
-        labels.append(task["process"].split(":")[-1:])
-
-    earliest = min(x1_pos)
-    latest = max(ends)
+
+def plot_task_timeline(tasks, output=None):
+    starts = np.array([int(task["start"]) for task in tasks], dtype=np.int64)
+    ends = np.array([int(task["complete"]) for task in tasks], dtype=np.int64)
+    labels = [task["process"].split(":")[-1] for task in tasks]
+    processes = list(dict.fromkeys(labels))  # in order of first appearance, as barh placed them
+    process_rows = {process: row for (row, process) in enumerate(processes)}
+    rows = np.array([process_rows[label] for label in labels], dtype=np.int64)
+
+    earliest = int(starts.min())
+    latest = int(ends.max())
     earliest_hh = int(pd.to_datetime(earliest, unit="ms").round('60min').timestamp() * 1000)  # closest hour in ms
     latest_hh = int(pd.to_datetime(latest, unit="ms").round('60min').timestamp() * 1000)  # closest hour in ms
-    diff = 60 * 60 * 1000  # 15 minutes in ms
+    diff = HOUR_MS
     ticks = []
     ticklabels = []
 
@@ -118,41 +121,54 @@ def plot_task_timeline(tasks):
     while i <= latest_hh + diff:
         ticks.append(i)
         ticklabels.append(pd.to_datetime(i, unit="ms").strftime("%H:%M"))
-        i += diff 
+        i += diff
 
     fig, ax = plt.subplots()
-    ax.invert_yaxis()
+    margin = (latest - earliest) * 0.05
+    ax.set_xlim(earliest - margin, latest + margin)
+    pixel_ms = max((latest - earliest + 2 * margin) / ax.get_window_extent().width, 1)  # time covered by one pixel
 
-    for i in range(len(tasks)):
-        ax.barh(labels[i], widths[i], left=x1_pos[i], label=labels[i], alpha=0.7)
+    # one collection of bars per process, tasks are merged where they overlap or are within a pixel of each other
+    order = np.argsort(rows, kind="stable")
+    bounds = np.flatnonzero(np.diff(rows[order])) + 1
 
-    i = earliest_hh
-    while i <= latest_hh:
-        ax.axvline(i)
-        i += diff
+    for group in np.split(order, bounds):
+        row = int(rows[group[0]])
+        (bar_starts, bar_ends) = merge_intervals(starts[group], ends[group], pixel_ms)
+        widths = np.maximum(bar_ends - bar_starts, pixel_ms)  # bars narrower than a pixel are still drawn
+        ax.broken_barh(np.column_stack((bar_starts, widths)), (row - 0.4, 0.8), facecolors=f"C{row % 10}", alpha=0.7)
+
+    ax.set_yticks(range(len(processes)))
+    ax.set_yticklabels(processes)
+    ax.set_ylim(len(processes) - 0.5, -0.5)  # first process at the top
+    ax.vlines(np.arange(earliest_hh, latest_hh + 1, diff), 0, 1, transform=ax.get_xaxis_transform())
 
     tasks_by_hour = get_tasks_by_hour(earliest_hh, latest_hh, tasks)
 
-    ax.set_xticks(ticks)
-    ax.set_xticklabels(ticklabels)
+    every = -(-len(ticks) // MAX_TICKS)
+    ax.set_xticks(ticks[::every])
+    ax.set_xticklabels(ticklabels[::every])
 
-    plt.show()
+    if output is None:
+        plt.show()
+    else:
+        fig.savefig(output)  # no display needed, the format follows the file extension (png, svg, ...)
+        plt.close(fig)
 
     return tasks_by_hour
 
 
-def extract_timeline(filename):
+def extract_timeline(filename, output=None):
     if len(filename.split(".")) > 1:
         filename = filename.split(".")[-2]
 
-    records = parse_trace_file(f"data/trace/{filename}.{FILE}")
     data_records = []
 
-    for record in records:
+    for record in iter_trace_file(f"data/trace/{filename}.{FILE}"):
         data = get_timeline_data(record)
         data_records.append(data)
 
-    return plot_task_timeline(data_records)
+    return plot_task_timeline(data_records, output)
 
 
 def get_ci_for_interval(start, end):
@@ -163,9 +179,14 @@ def get_ci_for_interval(start, end):
 if __name__ == '__main__':
     # Parse Arguments
     arguments = sys.argv[1:]
+    output = [argument[len(OUTPUT_FLAG):] for argument in arguments if argument.startswith(OUTPUT_FLAG)]
+    arguments = [argument for argument in arguments if not argument.startswith(OUTPUT_FLAG)]
 
     if len(arguments) != 1:
         print_usage_exit()
 
+    if len(output) > 0:
+        plt.switch_backend("Agg")  # headless, nothing is shown
+
     filename = arguments[0]
-    extract_timeline(filename)
+    extract_timeline(filename, output[-1] if len(output) > 0 else None)
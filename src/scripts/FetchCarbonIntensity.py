@@ -3,7 +3,13 @@
 
 # Imports
 from src.models.IntensityInterval import IntensityInterval
-from datetime import datetime, date, timedelta
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, timedelta, timezone
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import json
+import os
 import sys
 import re
 import requests
@@ -13,7 +19,18 @@ import requests
 NG_BASE_URL = "https://api.carbonintensity.org.uk/"
 NG_ENDPOINT_INTENSITY = "intensity"
 NG_ENDPOINT_INTENSITY_DATE = NG_ENDPOINT_INTENSITY + "/date"
+NG_MAX_RANGE_DAYS = 14  # longest range the intensity/{from}/{to} endpoint accepts
 HEADERS = {"Accept": "application/json"}
+FETCH_WORKERS = 4  # concurrent requests
+RETRIES = 5
+BACKOFF_FACTOR = 0.5  # seconds, doubled after each retry
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+TIMEOUT = 30  # seconds
+WORKERS_FLAG = "--workers="
+BASE_URL_FLAG = "--base-url="
+NO_STORE_FLAG = "--no-store"
+STORE_FOLDER = "data/store/"
+STORE_VERSION = 1
 ELECTRICITY_MAPS = "electricity-maps"
 NATIONAL_GRID = "national-grid"
 SOURCE = "source"
@@ -39,11 +56,10 @@ def to_timestamp_from_str(time):
     return stamp.timestamp() * 1000
 
 
-def within_bound(interval, start, end):
+def within_bound(interval, start_stamp, end_stamp):
+    # bounds are timestamps (ms), converted once per request rather than per interval
     interval_start = to_timestamp_from_str(interval["from"])
     interval_end = to_timestamp_from_str(interval["to"])
-    start_stamp = to_timestamp_from_dict(start)
-    end_stamp = to_timestamp_from_dict(end)
     flag = 0
 
     if interval_start <= start_stamp and interval_end > start_stamp:
@@ -66,29 +82,172 @@ def make_ci_interval_national_grid(data):
     return IntensityInterval(date, start, end, forecast, actual, index)
 
 
-def get_carbon_intensity_national_grid_for_date(date):
-    url = f"{NG_BASE_URL}{NG_ENDPOINT_INTENSITY_DATE}/{date.year}-{date.month}-{date.day}"
-    response = requests.get(url=url, headers=HEADERS)
-    data = response.json()
-    return data["data"]
+def make_session(workers=FETCH_WORKERS):
+    # one connection pool shared by all workers, failed requests are retried with exponential backoff
+    retry = Retry(total=RETRIES, backoff_factor=BACKOFF_FACTOR, status_forcelist=RETRY_STATUSES, allowed_methods=["GET"])
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers, max_retries=retry)
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_national_grid_data(session, url):
+    response = session.get(url=url, timeout=TIMEOUT)
+    response.raise_for_status()
+    return response.json()["data"]
+
+
+def get_carbon_intensity_national_grid_for_date(date, session=None, base_url=NG_BASE_URL):
+    url = f"{base_url}{NG_ENDPOINT_INTENSITY_DATE}/{date.year}-{date.month}-{date.day}"
+    return get_national_grid_data(session or make_session(1), url)
 
 
-def fetch_carbon_intensity_national_grid(start, end):
-    data = []
+def get_carbon_intensity_national_grid_for_range(start_day, end_day, session=None, base_url=NG_BASE_URL):
+    # intervals from the start of start_day up to the start of end_day
+    url = f"{base_url}{NG_ENDPOINT_INTENSITY}/{start_day.isoformat()}T00:00Z/{end_day.isoformat()}T00:00Z"
+    return get_national_grid_data(session or make_session(1), url)
 
-    start_day = date(int(start[YEAR]), int(start[MONTH]), int(start[DAY]))
-    end_day = date(int(end[YEAR]), int(end[MONTH]), int(end[DAY]))
+
+def get_day_ranges(start_day, end_day):
+    # whole days from start_day to end_day (inclusive) in ranges the API accepts
+    ranges = []
     iter_day = start_day
 
     while iter_day <= end_day:
-        day_data = get_carbon_intensity_national_grid_for_date(iter_day)
-        interval = [entry for entry in day_data if within_bound(entry, start, end)]
-        day_intervals = [make_ci_interval_national_grid(entry) for entry in interval]
-        data.extend(day_intervals)
+        next_day = min(iter_day + timedelta(days=NG_MAX_RANGE_DAYS), end_day + timedelta(days=1))
+        ranges.append((iter_day, next_day))
+        iter_day = next_day
+
+    return ranges
+
+
+def fetch_national_grid_entries(ranges, workers=FETCH_WORKERS, base_url=NG_BASE_URL):
+    # raw intervals of every day range keyed by their start, ranges are fetched concurrently
+    entries = {}
+
+    with make_session(workers) as session, ThreadPoolExecutor(max_workers=workers) as pool:
+        responses = pool.map(lambda day_range: get_carbon_intensity_national_grid_for_range(*day_range, session, base_url), ranges)
+
+        for range_data in responses:  # in order of the ranges
+            for entry in range_data:
+                entries.setdefault(entry["from"], entry)  # ranges may share an interval at their boundary
+
+    return entries
+
+
+def get_intervals_within_bound(entries, start, end):
+    # keys are iso timestamps so they sort chronologically, only a day either side of the request is checked against the bounds
+    (start_day, end_day) = get_request_days(start, end)
+    keys = sorted(entries)
+    first = bisect_left(keys, (start_day - timedelta(days=1)).isoformat())
+    last = bisect_left(keys, (end_day + timedelta(days=2)).isoformat())
+    start_stamp = to_timestamp_from_dict(start)
+    end_stamp = to_timestamp_from_dict(end)
+    return [make_ci_interval_national_grid(entries[key]) for key in keys[first:last] if within_bound(entries[key], start_stamp, end_stamp)]
+
+
+def get_request_days(start, end):
+    return (date(int(start[YEAR]), int(start[MONTH]), int(start[DAY])), date(int(end[YEAR]), int(end[MONTH]), int(end[DAY])))
+
+
+def fetch_carbon_intensity_national_grid(start, end, workers=FETCH_WORKERS, base_url=NG_BASE_URL):
+    (start_day, end_day) = get_request_days(start, end)
+    entries = fetch_national_grid_entries(get_day_ranges(start_day, end_day), workers, base_url)
+    return get_intervals_within_bound(entries, start, end)
+
+
+def get_store_path(source, folder=STORE_FOLDER):
+    return os.path.join(folder, f"ci-{source}.json")
+
+
+def load_ci_store(source, folder=STORE_FOLDER):
+    # intervals held for a source and the days they cover, days are [first, last) pairs of iso dates
+    try:
+        with open(get_store_path(source, folder), 'r') as file:
+            store = json.load(file)
+
+        if store.get("version") == STORE_VERSION:
+            return ([(date.fromisoformat(first), date.fromisoformat(last)) for (first, last) in store["coverage"]],
+                    {entry["from"]: entry for entry in store["intervals"]})
+    except (OSError, ValueError, KeyError):
+        pass  # no or unreadable store, everything is fetched again
+
+    return ([], {})
+
+
+def save_ci_store(source, coverage, entries, folder=STORE_FOLDER):
+    os.makedirs(folder, exist_ok=True)
+    filepath = get_store_path(source, folder)
+    temp_filepath = f"{filepath}.{os.getpid()}.tmp"
+    store = {
+        "version": STORE_VERSION,
+        "coverage": [[first.isoformat(), last.isoformat()] for (first, last) in coverage],
+        "intervals": [entries[key] for key in sorted(entries)]
+    }
+
+    with open(temp_filepath, 'w') as file:
+        json.dump(store, file)
+
+    os.replace(temp_filepath, filepath)  # readers see the old or the new store, never a partial one
+
+
+def merge_coverage(coverage, ranges):
+    # sorted, non-overlapping [first, last) day ranges
+    merged = []
+
+    for (first, last) in sorted(coverage + ranges):
+        if len(merged) > 0 and first <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+
+    return merged
+
+
+def get_missing_days(coverage, start_day, end_day):
+    # [first, last) day ranges between start_day and end_day (inclusive) that are not covered
+    missing = []
+    iter_day = start_day
+    last_day = end_day + timedelta(days=1)
+
+    for (first, last) in coverage:
+        if last <= iter_day:
+            continue
+        if first >= last_day:
+            break
+        if first > iter_day:
+            missing.append((iter_day, first))
+        iter_day = max(iter_day, last)
+
+    if iter_day < last_day:
+        missing.append((iter_day, last_day))
+
+    return missing
+
+
+def fetch_carbon_intensity_national_grid_stored(start, end, workers=FETCH_WORKERS, base_url=NG_BASE_URL, folder=STORE_FOLDER):
+    # only days missing from the store are fetched, the window is then served from the store
+    (start_day, end_day) = get_request_days(start, end)
+    (coverage, entries) = load_ci_store(NATIONAL_GRID, folder)
+    missing = get_missing_days(coverage, start_day, end_day)
+
+    if len(missing) > 0:
+        ranges = [day_range for (first, last) in missing for day_range in get_day_ranges(first, last - timedelta(days=1))]
+        fetched = fetch_national_grid_entries(ranges, workers, base_url)
+
+        # days up to today may still change (e.g. actual values not yet known), they are stored but not marked as held
+        today = datetime.now(timezone.utc).date()
+        complete = [(first, min(last, today)) for (first, last) in missing if first < today]
 
-        iter_day += timedelta(days=1)
+        # merged with the store as it is now, in case another job has added to it since it was loaded
+        (coverage, entries) = load_ci_store(NATIONAL_GRID, folder)
+        entries.update(fetched)
+        coverage = merge_coverage(coverage, complete)
+        save_ci_store(NATIONAL_GRID, coverage, entries, folder)
 
-    return data
+    return get_intervals_within_bound(entries, start, end)
 
 
 def fetch_carbon_intensity_electricity_maps(start, end):
@@ -113,6 +272,7 @@ def print_usage_exit():
     print("[FetchCarbonIntensity] Usage: py FetchCarbonIntensity.py <source> <YYYY-MM-DD:HH-MM> <YYYY-MM-DD:HH-MM>")
     print(f"[FetchCarbonIntensity] $ py FetchCarbonIntensity.py {ELECTRICITY_MAPS} 2024-03-01:09-00 2024-03-03:17-00")
     print(f"[FetchCarbonIntensity] $ py FetchCarbonIntensity.py {NATIONAL_GRID} 2024-03-01:09-00 2024-03-01:17-00")
+    print(f"[FetchCarbonIntensity] Options: {WORKERS_FLAG}<concurrent-requests> {BASE_URL_FLAG}<url> (e.g. a local ServeCarbonIntensity stand-in) {NO_STORE_FLAG} (fetch everything, bypassing {STORE_FOLDER})")
     exit(-1)
 
 
@@ -157,12 +317,17 @@ def validate_arguments(args):
 # Main
 if __name__ == "__main__":
     arguments = sys.argv[1:]
+    workers = [int(argument[len(WORKERS_FLAG):]) for argument in arguments if argument.startswith(WORKERS_FLAG)]
+    base_url = [argument[len(BASE_URL_FLAG):] for argument in arguments if argument.startswith(BASE_URL_FLAG)]
+    use_store = NO_STORE_FLAG not in arguments
+    arguments = [argument for argument in arguments if not argument.startswith((WORKERS_FLAG, BASE_URL_FLAG)) and argument != NO_STORE_FLAG]
     settings = validate_arguments(arguments)
 
     if settings[SOURCE] == ELECTRICITY_MAPS:
         data = fetch_carbon_intensity_electricity_maps(settings[START], settings[END])
 
     if settings[SOURCE] == NATIONAL_GRID:
-        data = fetch_carbon_intensity_national_grid(settings[START], settings[END])
+        fetch = fetch_carbon_intensity_national_grid_stored if use_store else fetch_carbon_intensity_national_grid
+        data = fetch(settings[START], settings[END], workers[-1] if workers else FETCH_WORKERS, base_url[-1] if base_url else NG_BASE_URL)
 
     report_carbon_intensity_data(data, settings[SOURCE], settings[START], settings[END])
@@ -0,0 +1,210 @@
+from src.models.TraceRecord import TraceRecord
+from src.models.TraceSchema import TraceSchema
+from src.models.HourlyEnergy import HourlyEnergy
+from src.scripts.CarbonFootprint import get_task_fragments, get_task_columns, estimate_energy_consumption_ccf, get_ci_for_hour, parse_ci_series, \
+    check_if_float, HOUR_MS, DEFAULT_PUE_VALUE, DEFAULT_MEMORY_POWER_DRAW
+import os
+import sys
+import time
+import numpy as np
+
+
+# Default Values
+FILE = "csv"
+DELIMITER = ","
+TRACE_FOLDER = "data/trace"
+CI_FOLDER = "data/intensity"
+INTERVAL_FLAG = "--interval="
+ONCE_FLAG = "--once"
+DEFAULT_INTERVAL = 30.0  # seconds between reads of the trace
+READ_SIZE = 1 << 20  # bytes read from the trace at a time
+BREAKDOWN_HEADERS = ["hour", "fragments", "energy", "energy-pue", "memory", "memory-pue", "ci", "co2e"]
+
+
+# Functions
+def print_usage_exit():
+    usage = "Ichnos (Follow): python -m src.scripts.FollowFootprint <trace-name|trace-file> <ci-value|ci-file-name> <min-watts> <max-watts> <? pue=1.0> <? memory-coeff=0.392> <? --interval=seconds> <? --once>"
+    example = "Ichnos (Follow): python -m src.scripts.FollowFootprint work/trace.txt ci 65 113 1.0 0.392 --interval=60"
+    print(usage)
+    print(example)
+    exit(-1)
+
+
+def get_trace_path(trace):
+    # a running pipeline writes its trace outside of data/trace, so a path is used as is
+    if os.path.isfile(trace) or os.path.dirname(trace) != "":
+        return trace
+
+    return f"{TRACE_FOLDER}/{trace}.{FILE}"
+
+
+def make_follow_state(filepath, pue, min_watts, max_watts, memory_coefficient):
+    return {
+        "filepath": filepath,
+        "position": 0,
+        "remainder": b"",
+        "schema": None,
+        "tasks": 0,
+        "hourly": HourlyEnergy(HOUR_MS),
+        "arguments": (pue, min_watts, max_watts, memory_coefficient)
+    }
+
+
+def read_new_lines(state):
+    # complete lines appended since the last read, a partly written row is kept until its newline arrives
+    size = os.path.getsize(state["filepath"])
+
+    if size < state["position"]:
+        # the trace was replaced (e.g. a new run), start again from the top
+        state.update(make_follow_state(state["filepath"], *state["arguments"]))
+
+    with open(state["filepath"], 'rb') as file:
+        file.seek(state["position"])
+        data = state["remainder"]
+        chunk = file.read(READ_SIZE)
+
+        while chunk:
+            data += chunk
+            chunk = file.read(READ_SIZE)
+
+        state["position"] = file.tell()
+
+    end = data.rfind(b"\n") + 1
+    state["remainder"] = data[end:]
+
+    return [line.rstrip() for line in data[:end].decode("utf-8").split("\n") if len(line.strip()) > 0]
+
+
+def update_follow_state(state):
+    # parses only the rows appended since the last update and adds their energy to the hours they overlap
+    lines = read_new_lines(state)
+
+    if state["schema"] is None and len(lines) > 0:
+        delimiter = "\t" if "\t" in lines[0] else DELIMITER  # nextflow writes tab separated traces
+        state["schema"] = TraceSchema(lines[0], delimiter)
+        lines = lines[1:]
+
+    if len(lines) == 0:
+        return np.array([], dtype=np.int64)
+
+    indices = []
+    fragments = []
+
+    for line in lines:
+        task = TraceRecord(state["schema"], line, state["schema"].get_delimiter()).make_carbon_record()
+
+        for (index, fragment, _) in get_task_fragments(task, 0, None):
+            indices.append(index)
+            fragments.append(fragment)
+
+    (pue, min_watts, max_watts, memory_coefficient) = state["arguments"]
+    (energy, memory) = estimate_energy_consumption_ccf(get_task_columns(fragments), min_watts, max_watts, memory_coefficient)
+    state["tasks"] += len(lines)
+
+    return state["hourly"].add(indices, np.column_stack((energy, energy * pue, memory, memory * pue)))
+
+
+def get_breakdown(state, ci):
+    # co2e is linear in the energy of each hour, so a changed ci file only needs the hourly sums
+    rows = []
+
+    for hour in state["hourly"].get_hours():
+        energy = state["hourly"].get_energy(hour)
+
+        try:
+            ci_val = get_ci_for_hour(ci, hour)
+        except KeyError:
+            ci_val = float("nan")  # not in the ci data (yet)
+
+        rows.append([hour, state["hourly"].get_count(hour)] + energy.tolist() + [ci_val, (energy[1] + energy[3]) * ci_val])
+
+    return rows
+
+
+def write_breakdown(filename, rows):
+    temp_filename = f"{filename}.{os.getpid()}.tmp"
+
+    with open(temp_filename, 'w') as file:
+        file.write(f"{DELIMITER.join(BREAKDOWN_HEADERS)}\n")
+
+        for row in rows:
+            file.write(f"{DELIMITER.join([str(val) for val in row])}\n")
+
+    os.replace(temp_filename, filename)  # readers never see a half written breakdown
+
+
+def report(state, ci, output):
+    rows = get_breakdown(state, ci)
+    totals = state["hourly"].get_totals()
+    co2e = [row[-1] for row in rows if not np.isnan(row[-1])]
+    missing = len(rows) - len(co2e)
+    write_breakdown(output, rows)
+
+    summary = f"[FollowFootprint] {state['tasks']} Tasks over {len(rows)} Hours: Energy (inc. PUE) {totals[1] + totals[3]}kWh, Carbon Emissions {sum(co2e)}gCO2e"
+
+    if missing > 0:
+        summary += f" ({missing} Hours without Carbon Intensity)"
+
+    print(summary)
+    return summary
+
+
+def load_ci(ci, loaded=None):
+    # a ci file is re-read when it changes, e.g. as FetchCarbonIntensity adds the latest data
+    if isinstance(ci, float):
+        return (ci, None)
+
+    filename = f"{CI_FOLDER}/{ci}.{FILE}"
+    mtime = os.stat(filename).st_mtime_ns
+
+    if loaded is not None and loaded[1] == mtime:
+        return loaded
+
+    return (parse_ci_series(filename), mtime)
+
+
+def follow(trace, ci, pue, min_watts, max_watts, memory_coefficient, interval=DEFAULT_INTERVAL, once=False):
+    filepath = get_trace_path(trace)
+    ci_name = str(int(ci)) if isinstance(ci, float) else ci
+    output = f"output/{os.path.splitext(os.path.basename(filepath))[0]}-{ci_name}-hourly.{FILE}"
+    state = make_follow_state(filepath, pue, min_watts, max_watts, memory_coefficient)
+    loaded = load_ci(ci)
+    summary = None  # nothing is reported until the trace exists
+
+    try:
+        while True:
+            if os.path.exists(filepath):
+                changed = update_follow_state(state)
+                previous = loaded
+                loaded = load_ci(ci, loaded)
+
+                if len(changed) > 0 or loaded is not previous or summary is None:
+                    summary = report(state, loaded[0], output)
+
+            if once:
+                return (summary, state)
+
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        return (summary, state)
+
+
+# Main Script
+if __name__ == '__main__':
+    # Parse Arguments
+    arguments = sys.argv[1:]
+    once = ONCE_FLAG in arguments
+    interval = [float(argument[len(INTERVAL_FLAG):]) for argument in arguments if argument.startswith(INTERVAL_FLAG)]
+    arguments = [argument for argument in arguments if argument != ONCE_FLAG and not argument.startswith(INTERVAL_FLAG)]
+
+    if len(arguments) != 4 and len(arguments) != 6:
+        print_usage_exit()
+
+    trace = arguments[0]
+    ci = float(arguments[1]) if check_if_float(arguments[1]) else arguments[1]
+    min_watts = float(arguments[2])
+    max_watts = float(arguments[3])
+    pue = float(arguments[4]) if len(arguments) == 6 else DEFAULT_PUE_VALUE
+    memory_coefficient = float(arguments[5]) if len(arguments) == 6 else DEFAULT_MEMORY_POWER_DRAW
+
+    follow(trace, ci, pue, min_watts, max_watts, memory_coefficient, interval[-1] if len(interval) > 0 else DEFAULT_INTERVAL, once)
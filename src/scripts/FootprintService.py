@@ -0,0 +1,302 @@
+# Script to Serve Footprint, Breakdown and Shift Queries from a Long-running Process with Warm Caches
+
+
+# Imports
+from src.models.LRUCache import LRUCache
+from src.scripts.CarbonFootprint import extract_task_batch, get_tasks_by_hour_stream, get_fragment_columns, get_task_columns, \
+    estimate_energy_consumption_ccf, calculate_carbon_footprint_ccf_columns, parse_ci_series, check_if_float, CI, HOUR, DEFAULT_PUE_VALUE, DEFAULT_MEMORY_POWER_DRAW
+from src.scripts.BatchFootprint import get_ci_column
+from src.scripts import TemporalInterrupt
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from collections import deque
+from threading import Thread, Lock
+import json
+import math
+import os
+import sys
+import time
+import numpy as np
+
+
+# Constants
+FILE = "csv"
+TRACE_FOLDER = "data/trace"
+CI_FOLDER = "data/intensity"
+TRACES_FLAG = "--traces="
+CIS_FLAG = "--cis="
+RESULTS_FLAG = "--results="
+DEFAULT_TRACES = 16  # parsed traces kept in memory
+DEFAULT_CIS = 8  # parsed ci series kept in memory
+DEFAULT_RESULTS = 1024  # query results kept in memory
+LATENCY_WINDOW = 1000  # recent requests per endpoint used for the latency percentiles
+TOTAL_HEADERS = ["energy", "energy-pue", "memory", "memory-pue", "co2e"]
+
+
+# Functions
+def get_file_version(filepath):
+    # a cached entry is stale once its file has changed
+    stat = os.stat(filepath)
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def make_service(traces=DEFAULT_TRACES, cis=DEFAULT_CIS, results=DEFAULT_RESULTS):
+    return {
+        "traces": LRUCache(traces),
+        "cis": LRUCache(cis),
+        "results": LRUCache(results),
+        "latencies": {},
+        "requests": {},
+        "errors": {},
+        "lock": Lock(),
+        "started": time.time()
+    }
+
+
+def load_trace(name):
+    # everything about a trace that does not depend on the ci or the power model
+    batch = extract_task_batch(name)
+    (tasks_by_hour, overhead_hours) = get_tasks_by_hour_stream(batch)
+    (columns, _) = get_fragment_columns(tasks_by_hour, 1.0)
+
+    return {"tasks_by_hour": tasks_by_hour, "overhead_hours": overhead_hours, "columns": columns, "task_columns": get_task_columns(batch)}
+
+
+def get_trace(service, name):
+    if len(name.split(".")) > 1:
+        name = name.split(".")[-2]
+
+    filepath = f"{TRACE_FOLDER}/{name}.{FILE}"
+
+    if not os.path.isfile(filepath):
+        raise FileNotFoundError(filepath)
+
+    version = get_file_version(filepath)
+    return (service["traces"].get_or_load(name, lambda: load_trace(name), version), version)
+
+
+def get_ci(service, name):
+    if check_if_float(name):
+        return ((float(name), None), None)
+
+    filepath = f"{CI_FOLDER}/{name}.{FILE}"
+
+    if not os.path.isfile(filepath):
+        raise FileNotFoundError(filepath)
+
+    def load_ci():
+        ci = parse_ci_series(filepath)
+        return (ci, TemporalInterrupt.make_ci_index(ci))
+
+    version = get_file_version(filepath)
+    return (service["cis"].get_or_load(name, load_ci, version), version)
+
+
+def get_parameters(query):
+    def get(name, default=None):
+        values = query.get(name)
+
+        if values is None or len(values) == 0:
+            if default is None:
+                raise ValueError(f"missing parameter '{name}'")
+            return default
+
+        return values[-1]
+
+    return {
+        "trace": get("trace"),
+        "ci": get("ci"),
+        "min-watts": float(get("min-watts")),
+        "max-watts": float(get("max-watts")),
+        "pue": float(get("pue", str(DEFAULT_PUE_VALUE))),
+        "memory-coeff": float(get("memory-coeff", str(DEFAULT_MEMORY_POWER_DRAW))),
+        "integrate": get("integrate", "false").lower() in ["1", "true", "yes"],
+        "optimal": get("optimal", "false").lower() in ["1", "true", "yes"]
+    }
+
+
+def to_json_value(value):
+    # json has no nan, missing results are null
+    if isinstance(value, float) and math.isnan(value):
+        return None
+
+    return value
+
+
+def query_footprint(trace, ci, parameters):
+    # a ci that does not cover the trace raises KeyError, as for shift queries
+    columns = dict(trace["task_columns"] if parameters["integrate"] else trace["columns"])  # the cached columns are shared between requests
+    columns[CI] = get_ci_column(columns, ci[0], parameters["integrate"])
+    totals = calculate_carbon_footprint_ccf_columns(columns, None, parameters["pue"], parameters["min-watts"], parameters["max-watts"], parameters["memory-coeff"])
+
+    return dict(zip(TOTAL_HEADERS, totals))
+
+
+def query_breakdown(trace, ci, parameters):
+    columns = trace["columns"]
+    (energy, memory) = estimate_energy_consumption_ccf(columns, parameters["min-watts"], parameters["max-watts"], parameters["memory-coeff"])
+    (hours, inverse) = np.unique(columns[HOUR], return_inverse=True)
+    energy_pue = np.bincount(inverse, weights=energy * parameters["pue"], minlength=len(hours))
+    memory_pue = np.bincount(inverse, weights=memory * parameters["pue"], minlength=len(hours))
+    counts = np.bincount(inverse, minlength=len(hours))
+    ci_vals = np.full(len(hours), ci[0]) if isinstance(ci[0], float) else ci[0].get_values_at(hours, strict=False)
+
+    return [{
+        "hour": hour,
+        "fragments": count,
+        "energy-pue": hour_energy,
+        "memory-pue": hour_memory,
+        "ci": to_json_value(ci_val),
+        "co2e": to_json_value((hour_energy + hour_memory) * ci_val)
+    } for (hour, count, hour_energy, hour_memory, ci_val) in zip(hours.tolist(), counts.tolist(), energy_pue.tolist(), memory_pue.tolist(), ci_vals.tolist())]
+
+
+def query_shift(trace, ci, parameters):
+    # the TemporalInterrupt exploration of the flexible windows, without re-reading the trace or the ci
+    if isinstance(ci[0], float):
+        raise ValueError("shifting needs a ci file")
+
+    explore = TemporalInterrupt.explore_optimal_shifts if parameters["optimal"] else TemporalInterrupt.explore_temporal_shifts
+
+    try:
+        (co2e, results) = explore(parameters["trace"], trace["tasks_by_hour"], ci[0], parameters["min-watts"], parameters["max-watts"], trace["overhead_hours"],
+                                  parameters["pue"], parameters["memory-coeff"], ci[1])
+    except ValueError as error:
+        raise KeyError(str(error))  # the ci does not cover the shift windows, reported as an uncovered trace is
+
+    shifts = []
+
+    for (shift, (saving, shift_co2e, overhead, *plan)) in zip(TemporalInterrupt.SHIFTS, results):
+        shift_result = {"hours": shift, "saving": saving, "co2e": shift_co2e, "overhead": overhead}  # saving in %, overhead in s
+
+        if len(plan) > 0:
+            shift_result["plan"] = plan[0]
+
+        shifts.append(shift_result)
+
+    return {"co2e": co2e, "shifts": shifts}
+
+
+QUERIES = {"footprint": query_footprint, "breakdown": query_breakdown, "shift": query_shift}
+
+
+def answer_query(service, endpoint, query):
+    parameters = get_parameters(query)
+    (trace, trace_version) = get_trace(service, parameters["trace"])
+    (ci, ci_version) = get_ci(service, parameters["ci"])
+    key = (endpoint, tuple(sorted(parameters.items())))
+
+    return service["results"].get_or_load(key, lambda: QUERIES[endpoint](trace, ci, parameters), (trace_version, ci_version))
+
+
+def record_request(service, endpoint, seconds, failed):
+    with service["lock"]:
+        service["latencies"].setdefault(endpoint, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+        service["requests"][endpoint] = service["requests"].get(endpoint, 0) + 1
+        service["errors"][endpoint] = service["errors"].get(endpoint, 0) + (1 if failed else 0)
+
+
+def get_metrics(service):
+    endpoints = {}
+
+    with service["lock"]:
+        for (endpoint, latencies) in service["latencies"].items():
+            recent = np.array(latencies, dtype=np.float64)
+            endpoints[endpoint] = {
+                "requests": service["requests"][endpoint],
+                "errors": service["errors"].get(endpoint, 0),
+                "latency-ms": {
+                    "mean": float(recent.mean() * 1000),
+                    "p50": float(np.percentile(recent, 50) * 1000),
+                    "p95": float(np.percentile(recent, 95) * 1000),
+                    "max": float(recent.max() * 1000)
+                }
+            }
+
+    return {
+        "uptime-s": time.time() - service["started"],
+        "endpoints": endpoints,
+        "caches": {name: service[name].get_stats() for name in ["traces", "cis", "results"]}
+    }
+
+
+def make_handler(service):
+    class FootprintHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, so a portal can reuse its connection
+
+        def do_GET(self):
+            started = time.perf_counter()
+            url = urlparse(self.path)
+            endpoint = url.path.strip("/")
+            status = 200
+
+            try:
+                if endpoint == "metrics":
+                    body = get_metrics(service)
+                elif endpoint in QUERIES:
+                    body = answer_query(service, endpoint, parse_qs(url.query))
+                else:
+                    (status, body) = (404, {"error": f"unknown endpoint '{endpoint}'"})
+            except FileNotFoundError as error:
+                (status, body) = (404, {"error": f"not found: {error}"})
+            except ValueError as error:
+                (status, body) = (400, {"error": str(error)})
+            except KeyError as error:
+                (status, body) = (422, {"error": f"carbon intensity data does not cover the query: {error.args[0] if error.args else error}"})
+            except Exception as error:
+                (status, body) = (500, {"error": repr(error)})  # the service keeps running for other requests
+
+            self.reply(status, body)
+
+            if endpoint in QUERIES:
+                record_request(service, endpoint, time.perf_counter() - started, status != 200)
+
+        def reply(self, status, body):
+            content = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, format, *args):
+            pass  # request latency is reported by /metrics
+
+    return FootprintHandler
+
+
+def start_server(port=0, traces=DEFAULT_TRACES, cis=DEFAULT_CIS, results=DEFAULT_RESULTS):
+    # serves on a background thread, port 0 picks a free port, the base url is http://127.0.0.1:<port>/
+    service = make_service(traces, cis, results)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(service))
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, daemon=True).start()
+
+    return (server, f"http://127.0.0.1:{server.server_address[1]}/", service)
+
+
+def print_usage_exit():
+    print("[FootprintService] Usage: py FootprintService.py <port> <? --traces=n> <? --cis=n> <? --results=n>")
+    print("[FootprintService] $ py FootprintService.py 8081 --traces=32")
+    print("[FootprintService] GET /footprint|/breakdown|/shift ?trace=&ci=&min-watts=&max-watts=&pue=&memory-coeff=&integrate=&optimal=, GET /metrics")
+    exit(-1)
+
+
+# Main
+if __name__ == "__main__":
+    arguments = sys.argv[1:]
+    capacities = {}
+
+    for (flag, default) in [(TRACES_FLAG, DEFAULT_TRACES), (CIS_FLAG, DEFAULT_CIS), (RESULTS_FLAG, DEFAULT_RESULTS)]:
+        values = [int(argument[len(flag):]) for argument in arguments if argument.startswith(flag)]
+        capacities[flag] = values[-1] if len(values) > 0 else default
+
+    arguments = [argument for argument in arguments if not argument.startswith((TRACES_FLAG, CIS_FLAG, RESULTS_FLAG))]
+
+    if len(arguments) != 1 or not arguments[0].isnumeric():
+        print_usage_exit()
+
+    service = make_service(capacities[TRACES_FLAG], capacities[CIS_FLAG], capacities[RESULTS_FLAG])
+    server = ThreadingHTTPServer(("127.0.0.1", int(arguments[0])), make_handler(service))
+    print(f"[FootprintService] Serving at [http://127.0.0.1:{arguments[0]}/]")
+    server.serve_forever()
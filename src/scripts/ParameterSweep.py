@@ -0,0 +1,138 @@
+from src.scripts.CarbonFootprint import extract_tasks_by_hour, extract_task_batch, get_fragment_columns, get_task_columns, get_time_weighted_ci, \
+    parse_ci_series, check_if_float, REALTIME, CPUS, CPU_USAGE, MEMORY, START, COMPLETE, CI, HOUR, DEFAULT_PUE_VALUE, DEFAULT_MEMORY_POWER_DRAW, \
+    BYTES_PER_GB
+from itertools import product
+import sys
+import numpy as np
+
+
+# Default Values
+FILE = "csv"
+DELIMITER = ","
+INTEGRATE_FLAG = "--integrate"
+GRID_FLAG = "--grid="
+GRID_HEADERS = ["min-watts", "max-watts", "pue", "memory-coefficient"]
+RESULT_HEADERS = GRID_HEADERS + ["energy", "energy-pue", "memory", "memory-pue", "co2e"]
+
+
+# Functions
+def print_usage_exit():
+    usage = "Ichnos (Sweep): python -m src.scripts.ParameterSweep <trace-name> <ci-value|ci-file-name> <min-watts,...> <max-watts,...> <? pue,...=1.0> <? memory-coeff,...=0.392> <? --integrate>"
+    grid = "Ichnos (Sweep): python -m src.scripts.ParameterSweep <trace-name> <ci-value|ci-file-name> --grid=<grid-file> <? --integrate>"
+    example = "Ichnos (Sweep): python -m src.scripts.ParameterSweep test ci 10,20 100,150,200 1.0,1.2,1.5 0.392"
+    print(usage)
+    print(grid)
+    print(example)
+    exit(-1)
+
+
+def get_sufficient_statistics(columns):
+    # energy is linear in the parameters, per task: core = min * hours + (max - min) * busy hours, memory = coeff * GB hours
+    time = columns[REALTIME] / 1000 / 3600 * 0.001  # h, with the W to kW conversion folded in
+    cpu_usage = columns[CPU_USAGE] / (100.0 * columns[CPUS])
+    memory = columns[MEMORY] / BYTES_PER_GB  # memory reported in bytes
+    return np.column_stack((time, cpu_usage * time, memory * time))
+
+
+def reduce_by_interval(statistics, ci_vals, intervals):
+    # sums the statistics of every ci interval, so the grid is evaluated against one row per interval rather than per task
+    (starts, index, inverse) = np.unique(intervals, return_index=True, return_inverse=True)
+    reduced = np.column_stack([np.bincount(inverse, weights=statistics[:, j], minlength=len(starts)) for j in range(statistics.shape[1])])
+    return (reduced, ci_vals[index])
+
+
+def get_trace_statistics(trace, ci, integrate=False):
+    # (hours, busy hours, GB hours) and the same weighted by ci, summed over the whole trace
+    if integrate:
+        batch = extract_task_batch(trace)
+        columns = get_task_columns(batch)
+
+        if isinstance(ci, float):
+            ci_vals = np.full(len(batch), ci)
+        else:
+            ci_vals = get_time_weighted_ci(ci, columns[START], columns[COMPLETE])
+
+        statistics = get_sufficient_statistics(columns)  # every task has its own time-weighted ci
+    else:
+        (tasks_by_hour, _) = extract_tasks_by_hour(trace)
+        (columns, _) = get_fragment_columns(tasks_by_hour, ci)
+        (statistics, ci_vals) = reduce_by_interval(get_sufficient_statistics(columns), columns[CI], columns[HOUR])
+
+    return np.column_stack((statistics.sum(axis=0), ci_vals @ statistics))
+
+
+def evaluate_grid(statistics, grid):
+    # grid rows are (min-watts, max-watts, pue, memory-coefficient), one matrix product covers every row
+    grid = np.asarray(grid, dtype=np.float64).reshape(-1, len(GRID_HEADERS))
+    (min_watts, max_watts, pue, memory_coefficient) = grid.T
+    coefficients = np.column_stack((min_watts, max_watts - min_watts, memory_coefficient))
+    plain = coefficients * statistics[:, 0]
+    weighted = coefficients @ statistics[:, 1]
+
+    energy = plain[:, 0] + plain[:, 1]
+    memory = plain[:, 2]
+    co2e = weighted * pue
+    return np.column_stack((grid, energy, energy * pue, memory, memory * pue, co2e))
+
+
+def parse_values(value):
+    return [float(val) for val in value.split(",") if len(val) > 0]
+
+
+def make_grid(min_watts, max_watts, pues, memory_coefficients):
+    return [list(values) for values in product(min_watts, max_watts, pues, memory_coefficients)]
+
+
+def read_grid_file(filename):
+    with open(filename, 'r') as file:
+        header = [val.strip() for val in file.readline().split(DELIMITER)]
+        columns = [header.index(name) for name in GRID_HEADERS]
+        rows = [[val.strip() for val in line.split(DELIMITER)] for line in file if len(line.strip()) > 0]
+
+    return [[float(row[i]) for i in columns] for row in rows]
+
+
+def write_results(filename, results):
+    with open(filename, 'w') as file:
+        file.write(f"{DELIMITER.join(RESULT_HEADERS)}\n")
+
+        for row in results.tolist():
+            file.write(f"{DELIMITER.join([str(val) for val in row])}\n")
+
+
+def main(trace, ci, grid, integrate=False):
+    if isinstance(ci, float):
+        ci_name = str(int(ci))
+    else:
+        ci_name = ci
+        ci = parse_ci_series(f"data/intensity/{ci}.{FILE}")
+
+    statistics = get_trace_statistics(trace, ci, integrate)
+    results = evaluate_grid(statistics, grid)
+    write_results(f"output/{trace}-{ci_name}-sweep.{FILE}", results)
+
+    print(f"[ParameterSweep] Evaluated {len(results)} Parameter Sets for [{trace}] with [{ci_name}]")
+    return results
+
+
+# Main Script
+if __name__ == '__main__':
+    # Parse Arguments
+    arguments = sys.argv[1:]
+    integrate = INTEGRATE_FLAG in arguments
+    grid_files = [argument[len(GRID_FLAG):] for argument in arguments if argument.startswith(GRID_FLAG)]
+    arguments = [argument for argument in arguments if argument != INTEGRATE_FLAG and not argument.startswith(GRID_FLAG)]
+
+    if len(grid_files) > 0 and len(arguments) == 2:
+        grid = read_grid_file(grid_files[-1])
+    elif len(grid_files) == 0 and len(arguments) in [4, 6]:
+        pues = parse_values(arguments[4]) if len(arguments) == 6 else [DEFAULT_PUE_VALUE]
+        memory_coefficients = parse_values(arguments[5]) if len(arguments) == 6 else [DEFAULT_MEMORY_POWER_DRAW]
+        grid = make_grid(parse_values(arguments[2]), parse_values(arguments[3]), pues, memory_coefficients)
+    else:
+        print_usage_exit()
+
+    trace = arguments[0]
+    ci = float(arguments[1]) if check_if_float(arguments[1]) else arguments[1]
+
+    main(trace, ci, grid, integrate)
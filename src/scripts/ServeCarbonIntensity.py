@@ -0,0 +1,129 @@
+# Script to Serve Recorded Carbon Intensity Data as a Local Stand-in for the National Grid API
+
+
+# Imports
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from datetime import datetime, timedelta
+from threading import Thread
+from urllib.parse import urlparse
+import json
+import random
+import sys
+import time
+
+
+# Constants
+NG_TIME_FORMAT = "%Y-%m-%dT%H:%MZ"
+MAX_RANGE_DAYS = 14  # the API refuses longer ranges
+LATENCY_FLAG = "--latency="
+FAIL_RATE_FLAG = "--fail-rate="
+
+
+# Functions
+def parse_recorded_intervals(filenames):
+    # ci files as written by FetchCarbonIntensity (date,start,end,forecast,actual,index), keyed by interval start
+    intervals = {}
+
+    for filename in filenames:
+        with open(filename, 'r') as file:
+            header = [val.strip() for val in file.readline().split(",")]
+
+            for line in file:
+                row = dict(zip(header, [val.strip() for val in line.split(",")]))
+                start = datetime.strptime(f"{row['date'].replace('/', '-')} {row['start']}", "%Y-%m-%d %H:%M")
+                intervals[start] = {
+                    "from": start.strftime(NG_TIME_FORMAT),
+                    "to": (start + timedelta(minutes=30)).strftime(NG_TIME_FORMAT),
+                    "intensity": {"forecast": int(row['forecast']), "actual": int(row['actual']), "index": row['index']}
+                }
+
+    return [intervals[start] for start in sorted(intervals)]
+
+
+def parse_date(value):
+    # the client does not zero pad dates, e.g. 2024-3-1
+    (year, month, day) = [int(part) for part in value.split("-")]
+    return datetime(year, month, day)
+
+
+def get_intervals_between(intervals, start, end):
+    start = start.strftime(NG_TIME_FORMAT)
+    end = end.strftime(NG_TIME_FORMAT)
+    return [interval for interval in intervals if interval["from"] < end and interval["to"] > start]
+
+
+def make_handler(intervals, latency, fail_rate, seed=0):
+    failures = random.Random(seed)
+
+    class CarbonIntensityHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, so pooled client connections are reused
+
+        def do_GET(self):
+            time.sleep(latency)
+
+            if failures.random() < fail_rate:
+                return self.reply(503, {"error": {"code": "503", "message": "stand-in failure"}})
+
+            parts = [part for part in urlparse(self.path).path.split("/") if len(part) > 0]
+
+            try:
+                if len(parts) == 3 and parts[:2] == ["intensity", "date"]:
+                    start = parse_date(parts[2])
+                    return self.reply(200, {"data": get_intervals_between(intervals, start, start + timedelta(days=1))})
+
+                if len(parts) == 3 and parts[0] == "intensity":
+                    start = datetime.strptime(parts[1], NG_TIME_FORMAT)
+                    end = datetime.strptime(parts[2], NG_TIME_FORMAT)
+
+                    if end - start > timedelta(days=MAX_RANGE_DAYS):
+                        return self.reply(400, {"error": {"code": "400", "message": f"range is over {MAX_RANGE_DAYS} days"}})
+
+                    return self.reply(200, {"data": get_intervals_between(intervals, start, end)})
+            except ValueError:
+                return self.reply(400, {"error": {"code": "400", "message": "invalid date"}})
+
+            self.reply(404, {"error": {"code": "404", "message": "unknown endpoint"}})
+
+        def reply(self, status, body):
+            content = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, format, *args):
+            pass  # quiet, the stand-in is used for tests and benchmarks
+
+    return CarbonIntensityHandler
+
+
+def start_server(intervals, port=0, latency=0.0, fail_rate=0.0):
+    # serves on a background thread, port 0 picks a free port, the base url is http://127.0.0.1:<port>/
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(intervals, latency, fail_rate))
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, daemon=True).start()
+
+    return (server, f"http://127.0.0.1:{server.server_address[1]}/")
+
+
+def print_usage_exit():
+    print("[ServeCarbonIntensity] Usage: py ServeCarbonIntensity.py <port> <ci-file>... <? --latency=seconds> <? --fail-rate=0-1>")
+    print("[ServeCarbonIntensity] $ py ServeCarbonIntensity.py 8080 data/intensity/ci.csv --latency=0.2")
+    exit(-1)
+
+
+# Main
+if __name__ == "__main__":
+    arguments = sys.argv[1:]
+    latency = [float(argument[len(LATENCY_FLAG):]) for argument in arguments if argument.startswith(LATENCY_FLAG)]
+    fail_rate = [float(argument[len(FAIL_RATE_FLAG):]) for argument in arguments if argument.startswith(FAIL_RATE_FLAG)]
+    arguments = [argument for argument in arguments if not argument.startswith((LATENCY_FLAG, FAIL_RATE_FLAG))]
+
+    if len(arguments) < 2 or not arguments[0].isnumeric():
+        print_usage_exit()
+
+    intervals = parse_recorded_intervals(arguments[1:])
+    server = ThreadingHTTPServer(("127.0.0.1", int(arguments[0])), make_handler(intervals, latency[-1] if latency else 0.0, fail_rate[-1] if fail_rate else 0.0))
+    print(f"[ServeCarbonIntensity] Serving {len(intervals)} Intervals at [http://127.0.0.1:{arguments[0]}/]")
+    server.serve_forever()
@@ -1,8 +1,14 @@
 from src.models.TraceRecord import TraceRecord
-from src.models.CarbonRecord import CarbonRecord
+from src.models.CarbonIntensitySeries import CarbonIntensitySeries
+from src.models.CarbonIntensityIndex import CarbonIntensityIndex
+from src.scripts.CarbonFootprint import get_tasks_by_hour_with_overhead, get_ci_for_hour, parse_ci_series, get_fragment_columns, \
+    estimate_energy_consumption_ccf, sum_in_order, START, COMPLETE, HOUR, HOUR_MS
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from glob import glob
+import os
 import sys
 import datetime as time
-import copy
 import numpy as np
 
 
@@ -10,6 +16,11 @@ import numpy as np
 DEFAULT = "default"
 FILE = "csv"
 DELIMITER = ","
+OPTIMAL_FLAG = "--optimal"
+TRACES_FLAG = "--traces="
+WORKERS_FLAG = "--workers="
+SHIFTS = [6, 12, 24, 48, 96]
+BYTES_PER_GB = 1000000000  # the shifting results use decimal GB for memory, CarbonFootprint uses 2^30 bytes
 WORKFLOWS_M = [
     'mag-orig-ceph-1', 
     'mag-orig-ceph-2', 
@@ -53,35 +64,6 @@ def to_timestamp(ms):
     return time.datetime.fromtimestamp(float(ms) / 1000.0, tz=time.timezone.utc)
 
 
-def get_ci_file_data(filename):
-    with open(filename, 'r') as file:
-        raw = file.readlines()
-        header = [val.strip() for val in raw[0].split(",")]
-        data = raw[1:]
-
-    return (header, data)
-
-
-def parse_ci_intervals(filename):
-    (header, data) = get_ci_file_data(filename)
-
-    date_i = header.index("date")
-    start_i = header.index("start")
-    value_i = header.index("actual")
-
-    ci_map = {}
-
-    for row in data:
-        parts = row.split(",")
-        date = parts[date_i]
-        month_day = '/'.join([val.zfill(2) for val in date.split('-')[-2:]])
-        key = month_day + '-' + parts[start_i]
-        value = float(parts[value_i])
-        ci_map[key] = value
-
-    return ci_map
-
-
 def parse_trace_file(filepath):
     with open(filepath, 'r') as file:
         lines = [line.rstrip() for line in file]
@@ -97,8 +79,8 @@ def parse_trace_file(filepath):
 
 
 def print_usage_exit():
-    usage = "carbon-footprint $ python -m src.scripts.ExtractTimeline <ci-file-name> <min-watts> <max-watts>"
-    example = "carbon-footprint $ python -m src.scripts.ExtractTimeline ci-test 65 219"
+    usage = "carbon-footprint $ python -m src.scripts.TemporalInterrupt <ci-file-name> <pue> <memory-coefficient> <min-watts> <max-watts> <? --optimal> <? --traces=manifest|glob> <? --workers=n>"
+    example = "carbon-footprint $ python -m src.scripts.TemporalInterrupt ci-test 1.0 0.392 65 219 --traces=chipseq-* --workers=4"
 
     print(usage)
     print(example)
@@ -109,62 +91,6 @@ def get_carbon_record(record: TraceRecord):
     return record.make_carbon_record()
 
 
-def get_tasks_by_hour_with_overhead(start_hour, end_hour, tasks):
-    tasks_by_hour = {}
-    overheads = []
-    runtimes = []
-
-    step = 60 * 60 * 1000  # 60 minutes in ms
-    i = start_hour - step  # start an hour before to be safe
-    # total = 0
-
-    while i <= end_hour:
-        data = [] 
-        hour_overhead = 0
-
-        for task in tasks: 
-            start = int(task.get_start())
-            complete = int(task.get_complete())
-            # full task is within this hour
-            if start >= i and complete <= i + step:
-                data.append(task)
-                runtimes.append(complete - start)
-            # task ends within this hour (but starts in a previous hour)
-            elif complete > i and complete < i + step and start < i:
-                # add task from start of this hour until end of hour
-                partial_task = copy.deepcopy(task)
-                partial_task.set_start(i)
-                partial_task.set_realtime(complete - i)
-                data.append(partial_task)
-                runtimes.append(complete - i)
-            # task starts within this hour (but ends in a later hour) -- OVERHEAD
-            elif start > i and start < i + step and complete > i + step: 
-                # add task from start to end of this hour
-                partial_task = copy.deepcopy(task)
-                partial_task.set_complete(i + step)
-                partial_task.set_realtime(i + step - start)
-                data.append(partial_task)
-                if (i + step - start) > hour_overhead:  # get the overhead for the longest task that starts now but ends later
-                    hour_overhead = i + step - start
-                runtimes.append(i + step - start)
-            # task starts before hour and ends after this hour
-            elif start < i and complete > i + step:
-                partial_task = copy.deepcopy(task)
-                partial_task.set_start(i)
-                partial_task.set_complete(i + step)
-                partial_task.set_realtime(step)
-                data.append(partial_task)
-                runtimes.append(step)
-
-        tasks_by_hour[i] = data
-        overheads.append(hour_overhead)
-        i += step
-
-    # task_overall_runtime = sum(runtimes)
-
-    return (tasks_by_hour, overheads)
-
-
 def to_closest_hour_ms(original):
     ts = to_timestamp(original)
 
@@ -209,55 +135,68 @@ def extract_tasks_by_hour(filename):
     return get_tasks_by_hour(data_records)
 
 
-def calculate_carbon_footprint_for_task(task: CarbonRecord, min_watts, max_watts, memory_coefficient):
-    # Time (h)
-    time = task.get_realtime() / 1000 / 3600  # convert from ms to h
-    # Number of Cores (int)
-    no_cores = task.get_core_count()
-    # CPU Usage (%)
-    cpu_usage = task.get_cpu_usage() / (100.0 * no_cores)
-    # Memory (GB)
-    memory = task.get_memory() / 1000000000  # bytes to GB
-    # Core Energy Consumption (without PUE)
-    core_consumption = time * (min_watts + cpu_usage * (max_watts - min_watts)) * 0.001  # convert from W to kW
-    # Memory Power Consumption (without PUE)
-    memory_consumption = memory * memory_coefficient * time * 0.001  # convert from W to kW
-    # Overall and Memory Consumption (kW) (without PUE)
-    return (core_consumption, memory_consumption)
-
-
-def calculate_carbon_footprint(tasks_by_hour, ci, pue: float, min_watts, max_watts, memory_coefficient):
-    total_energy = 0.0
-    total_energy_pue = 0.0
-    total_memory_energy = 0.0
-    total_memory_energy_pue = 0.0
-    total_carbon_emissions = 0.0
+def get_fragment_energy_by_hour(tasks_by_hour, pue: float, min_watts, max_watts, memory_coefficient):
+    # fragment columns, fragments in each workflow hour and the energy inc. PUE (kWh) of every fragment in hour order, shared by both explore paths
+    (columns, _) = get_fragment_columns(tasks_by_hour, 1.0)
+    counts = [len(tasks) for tasks in tasks_by_hour.values() if len(tasks) > 0]
+    (energy, memory) = estimate_energy_consumption_ccf(columns, min_watts, max_watts, memory_coefficient, BYTES_PER_GB)
 
-    for hour, tasks in tasks_by_hour.items():
-        if len(tasks) > 0:
-            hour_ts = to_timestamp(hour)
-            month = str(hour_ts.month).zfill(2)
-            day = str(hour_ts.day).zfill(2)
-            hh = str(hour_ts.hour).zfill(2)
-            mm = str(hour_ts.minute).zfill(2)
-            ci_key = f'{month}/{day}-{hh}:{mm}'
-            ci_val = ci[ci_key] 
-
-            for task in tasks:
-                (energy, memory) = calculate_carbon_footprint_for_task(task, min_watts, max_watts, memory_coefficient)
-                energy_pue = energy * pue
-                memory_pue = memory * pue
-                task_footprint = (energy_pue + memory_pue) * ci_val
-                task.set_energy(energy_pue)
-                task.set_co2e(task_footprint)
-                task.set_avg_ci(ci_val)
-                total_energy += energy
-                total_energy_pue += energy_pue
-                total_memory_energy += memory
-                total_memory_energy_pue += memory_pue
-                total_carbon_emissions += task_footprint
-
-    return (total_energy, total_energy_pue, total_memory_energy, total_memory_energy_pue, total_carbon_emissions)
+    return (columns, counts, energy * pue + memory * pue)
+
+
+def sum_energy_by_hour(counts, energy):
+    # energy of each workflow hour from the energy of its fragments
+    return np.bincount(np.repeat(np.arange(len(counts)), counts), weights=energy, minlength=len(counts))
+
+
+def get_restart_energy(tasks_by_hour, overhead_hours, columns, counts, energy):
+    # pausing after a workflow hour loses the longest task still running at its end, that task's time (ms) and energy (kWh) are rerun on resume
+    overheads = np.array([overhead for (tasks, overhead) in zip(tasks_by_hour.values(), overhead_hours) if len(tasks) > 0], dtype=np.int64)
+    index = np.repeat(np.arange(len(counts)), counts)  # workflow hour of each fragment
+    hour_end = columns[HOUR] + HOUR_MS
+    lost = (overheads[index] > 0) & (columns[COMPLETE] == hour_end) & (hour_end - columns[START] == overheads[index])
+    restart = np.zeros(len(counts))
+    np.maximum.at(restart, index[lost], energy[lost])
+
+    return (overheads, restart)
+
+
+def schedule_interruptible(energy, restart_energy, ci_vals):
+    # places the workflow hours in order onto ci intervals for the lowest emissions inc. restarts, O(intervals x hours)
+    # cost[j] is the best footprint of hours 0..i with hour i in interval j, hour i either follows on from j - 1 or resumes after a pause
+    hours = len(energy)
+    intervals = len(ci_vals)
+    available = ~np.isnan(ci_vals)  # missing ci can not be scheduled
+    ci_vals = np.where(available, ci_vals, 0.0)
+    positions = np.arange(intervals)
+    cost = np.where(available & (positions <= intervals - hours), energy[0] * ci_vals, np.inf)
+    choices = []
+
+    for i in range(1, hours):
+        best = np.minimum.accumulate(cost)  # best cost of hour i - 1 up to each interval
+        best_at = np.maximum.accumulate(np.where(cost == best, positions, 0))
+        stay = np.concatenate(([np.inf], cost[:-1]))
+        pause = np.concatenate(([np.inf, np.inf], best[:-2] + restart_energy[i - 1] * ci_vals[2:]))
+        choices.append(np.where(stay <= pause, positions - 1, np.concatenate(([0, 0], best_at[:-2]))))
+        feasible = available & (positions >= i) & (positions <= intervals - hours + i)
+        cost = np.where(feasible, energy[i] * ci_vals + np.minimum(stay, pause), np.inf)
+
+    if not np.isfinite(cost).any():
+        raise ValueError("not enough ci data to schedule the workflow")
+
+    j = int(np.argmin(cost))
+    plan = [j]
+
+    for choice in reversed(choices):
+        j = int(choice[j])
+        plan.append(j)
+
+    return np.array(plan[::-1], dtype=np.int64)
+
+
+def calculate_footprint_for_hours(counts, energy, ci_vals):
+    # ci_vals holds one value per hour, summed per fragment in order so the total matches adding the fragments one by one
+    return sum_in_order(energy * np.repeat(np.asarray(ci_vals, dtype=np.float64), counts))
 
 
 def get_hours(arr):
@@ -274,49 +213,89 @@ def get_hours(arr):
     return hours
 
 
-def explore_temporal_shifting_for_workflow(workflow, tasks_by_hour, ci, min_watts, max_watts, overhead_hours, pue, memory_coefficient):
-    # Identify Hours in Order
+def get_ci_key(hour):
+    hour_ts = to_timestamp(hour)
+    month = str(hour_ts.month).zfill(2)
+    day = str(hour_ts.day).zfill(2)
+    hh = str(hour_ts.hour).zfill(2)
+    mm = str(hour_ts.minute).zfill(2)
+    return f'{month}/{day}-{hh}:{mm}'
+
+
+def make_ci_index(ci):
+    # built once per ci and shared by every workflow, dict keys are mapped to their positions to avoid list scans
+    if isinstance(ci, CarbonIntensitySeries):
+        return (CarbonIntensityIndex(ci.get_values()), None)
+
+    positions = {key: i for (i, key) in enumerate(ci.keys())}
+    return (CarbonIntensityIndex(np.array(list(ci.values()), dtype=np.float64)), positions)
+
+
+def get_hours_by_key(tasks_by_hour):
     hours_by_key = {}
 
     for hour, tasks in tasks_by_hour.items():
         if len(tasks) > 0:
-            hour_ts = to_timestamp(hour)
-            month = str(hour_ts.month).zfill(2)
-            day = str(hour_ts.day).zfill(2)
-            hh = str(hour_ts.hour).zfill(2)
-            mm = str(hour_ts.minute).zfill(2)
-            key = f'{month}/{day}-{hh}:{mm}'
-            hours_by_key[key] = tasks
+            hours_by_key[get_ci_key(hour)] = hour
+
+    return hours_by_key
 
-    # Calculate Original Carbon Footprint
-    (_, _, _, _, orig_carbon_emissions) = calculate_carbon_footprint(tasks_by_hour, ci, pue, min_watts, max_watts, memory_coefficient)
 
-    # Prepare Script Output
+def get_workflow_indices(ci, positions, hours_by_key):
+    # ci indices of the first and last hour the workflow executes over
+    keys = list(hours_by_key.keys())
+
+    if positions is None:
+        return (ci.get_index(hours_by_key[keys[0]]), ci.get_index(hours_by_key[keys[-1]]))
+
+    return (positions[keys[0]], positions[keys[-1]])
+
+
+def get_shift_window(workflow, shift, start_i, end_i, intervals):
+    # reliant on ci data provided being long enough for the shift window
+    if start_i - shift < 0:
+        raise ValueError(f"ci data does not cover {shift} hours before {workflow}")
+
+    return (start_i - shift, min(end_i + shift + 1, intervals))
+
+
+def format_shifts(workflow, orig_carbon_emissions, shifts):
+    # one csv row, each shift as saving%:footprint:overhead(s)[:plan]
     output = [workflow, str(orig_carbon_emissions)]
 
+    for (saving, carbon_emissions, overhead, *plan) in shifts:
+        output.append(':'.join([f'{saving:.1f}%', str(carbon_emissions), str(overhead)] + plan))
+
+    return ','.join(output)
+
+
+def explore_temporal_shifts(workflow, tasks_by_hour, ci, min_watts, max_watts, overhead_hours, pue, memory_coefficient, ci_index=None):
+    # original footprint and (saving %, footprint, overhead s) of every shift in SHIFTS
+    # Identify Hours in Order
+    hours_by_key = get_hours_by_key(tasks_by_hour)
+
+    # Reduce Workflow to Energy by Hour (once, reused for every shift)
+    (_, counts, energy) = get_fragment_energy_by_hour(tasks_by_hour, pue, min_watts, max_watts, memory_coefficient)
+
+    # Calculate Original Carbon Footprint
+    orig_carbon_emissions = calculate_footprint_for_hours(counts, energy, [get_ci_for_hour(ci, hour) for hour in hours_by_key.values()])
+
+    shifts = []
+
+    (index, positions) = make_ci_index(ci) if ci_index is None else ci_index
+    dat = index.get_values()  # ci values for the potential shifts
+    wf_hours = len(hours_by_key)  # hours of workflow execution
+    (start_i, end_i) = get_workflow_indices(ci, positions, hours_by_key)
+
     # SHIFTING LOGIC
-    for shift in [6, 12, 24, 48, 96]:  # flexibility to run over windows 'shift' hours before and after the workflow executed
-        keys = list(hours_by_key.keys())  # keys that the workflow executes over
-        wf_hours = len(keys)  # hours of workflow execution
-        ci_keys = list(ci.keys())  # all windows that have ci values, as keys
-        start = keys[0]  # workflow start key
-        end = keys[-1]  # workflow end key
-        start_i = ci_keys.index(start)  # workflow start index
-        end_i = ci_keys.index(end)  # workflow end index
-        shift_keys = ci_keys[start_i - shift:end_i + shift + 1]  # all keys within the shift
-        # reliant on ci data provided being long enough for the shift window, if not this will error
-
-        dat = np.array([ci[key] for key in shift_keys])  # store corresponding ci values for the potential shifts
-        ind = sorted(np.argpartition(dat, wf_hours)[:wf_hours])  # indices of the minimum ci values
-        # the indices are sorted to retain chronological order over time
-        min_keys = [shift_keys[i] for i in ind]  # matching keys for the minimum ci values
-
-        ci_for_shifted_trace = {}
-        for i in range(0, len(min_keys)):
-            ci_for_shifted_trace[keys[i]] = ci[min_keys[i]]
+    for shift in SHIFTS:  # flexibility to run over windows 'shift' hours before and after the workflow executed
+        (lo, hi) = get_shift_window(workflow, shift, start_i, end_i, len(index))
+
+        # indices of the minimum ci values within the shift, in chronological order
+        ind = index.get_lowest(lo, hi, wf_hours)
 
         # Report Optimal CI Temporal Shifting Carbon Footprint
-        (_, _, _, _, carbon_emissions) = calculate_carbon_footprint(tasks_by_hour, ci_for_shifted_trace, pue, min_watts, max_watts, memory_coefficient)
+        carbon_emissions = calculate_footprint_for_hours(counts, energy, dat[ind])  # i-th workflow hour runs in the i-th lowest ci hour
 
         # Report Overhead of Interrupting Temporal Shifting
         oh_hour_inds = get_hours(ind)
@@ -328,20 +307,136 @@ def explore_temporal_shifting_for_workflow(workflow, tasks_by_hour, ci, min_watt
 
         saving = ((orig_carbon_emissions - carbon_emissions) / orig_carbon_emissions) * 100
 
-        output.append(f'{saving:.1f}%:{carbon_emissions}:{overhead / 1000}')
+        shifts.append((saving, carbon_emissions, overhead / 1000))
 
-    return ','.join(output)
+    return (orig_carbon_emissions, shifts)
+
+
+def explore_temporal_shifting_for_workflow(workflow, tasks_by_hour, ci, min_watts, max_watts, overhead_hours, pue, memory_coefficient, ci_index=None):
+    return format_shifts(workflow, *explore_temporal_shifts(workflow, tasks_by_hour, ci, min_watts, max_watts, overhead_hours, pue, memory_coefficient, ci_index))
+
+
+def get_plan_label(plan, ci, ci_keys):
+    # runs of consecutive intervals as <first ci key>+<intervals>, separated by ';' at each pause
+    runs = np.split(plan, np.flatnonzero(np.diff(plan) != 1) + 1)
+    labels = []
+
+    for run in runs:
+        if ci_keys is None:
+            key = get_ci_key(ci.get_start() + int(run[0]) * ci.get_step())
+        else:
+            key = ci_keys[run[0]]
+        labels.append(f'{key}+{len(run)}')
+
+    return ';'.join(labels)
+
+
+def explore_optimal_shifts(workflow, tasks_by_hour, ci, min_watts, max_watts, overhead_hours, pue, memory_coefficient, ci_index=None):
+    # as explore_temporal_shifts, with the restart cost of every pause included when choosing the hours and the plan of each shift
+    hours_by_key = get_hours_by_key(tasks_by_hour)
+    (columns, counts, energy) = get_fragment_energy_by_hour(tasks_by_hour, pue, min_watts, max_watts, memory_coefficient)
+    hourly_energy = sum_energy_by_hour(counts, energy)
+    (overheads, restart_energy) = get_restart_energy(tasks_by_hour, overhead_hours, columns, counts, energy)
+
+    orig_carbon_emissions = calculate_footprint_for_hours(counts, energy, [get_ci_for_hour(ci, hour) for hour in hours_by_key.values()])
+    shifts = []
+
+    (index, positions) = make_ci_index(ci) if ci_index is None else ci_index
+    dat = index.get_values()
+    ci_keys = None if positions is None else list(ci.keys())
+    (start_i, end_i) = get_workflow_indices(ci, positions, hours_by_key)
+
+    for shift in SHIFTS:
+        (lo, hi) = get_shift_window(workflow, shift, start_i, end_i, len(index))
+        plan = lo + schedule_interruptible(hourly_energy, restart_energy, dat[lo:hi])
+
+        # emissions of the hours as they run plus the lost work rerun on every resume
+        pauses = np.array(get_hours(plan), dtype=np.int64)
+        restart_emissions = sum_in_order(restart_energy[pauses] * dat[plan[pauses + 1]])
+        carbon_emissions = calculate_footprint_for_hours(counts, energy, dat[plan]) + restart_emissions
+        overhead = int(overheads[pauses].sum())
+        saving = ((orig_carbon_emissions - carbon_emissions) / orig_carbon_emissions) * 100
 
+        shifts.append((saving, carbon_emissions, overhead / 1000, get_plan_label(plan, ci, ci_keys)))
 
-def main(workflows, ci, min_watts, max_watts, pue, memory_coefficient):
-    results = []
+    return (orig_carbon_emissions, shifts)
 
-    for workflow in workflows:
-        (tasks_by_hour, overhead_hours) = extract_tasks_by_hour(workflow)
-        result = explore_temporal_shifting_for_workflow(workflow, tasks_by_hour, ci, min_watts, max_watts, overhead_hours, pue, memory_coefficient)
-        results.append(result)
 
-    with open('output/workflows-temp-shift-interrupt.csv', 'w') as f:
+def explore_optimal_shifting_for_workflow(workflow, tasks_by_hour, ci, min_watts, max_watts, overhead_hours, pue, memory_coefficient, ci_index=None):
+    return format_shifts(workflow, *explore_optimal_shifts(workflow, tasks_by_hour, ci, min_watts, max_watts, overhead_hours, pue, memory_coefficient, ci_index))
+
+
+def explore_workflow(workflow, ci, min_watts, max_watts, pue, memory_coefficient, optimal, ci_index):
+    explore = explore_optimal_shifting_for_workflow if optimal else explore_temporal_shifting_for_workflow
+    (tasks_by_hour, overhead_hours) = extract_tasks_by_hour(workflow)
+    return explore(workflow, tasks_by_hour, ci, min_watts, max_watts, overhead_hours, pue, memory_coefficient, ci_index)
+
+
+# state of each pool worker, set once by init_worker rather than sent with every workflow
+worker_state = {}
+
+
+def init_worker(ci, shared_ci, min_watts, max_watts, pue, memory_coefficient, optimal):
+    if shared_ci is not None:
+        # the series values are read in place from the parent's shared memory, which the parent also unlinks
+        (name, start, step, length) = shared_ci
+        memory = SharedMemory(name=name)
+        ci = CarbonIntensitySeries(start, step, np.ndarray(length, dtype=np.float64, buffer=memory.buf))
+        worker_state["memory"] = memory
+
+    worker_state["ci"] = ci
+    worker_state["ci_index"] = make_ci_index(ci)
+    worker_state["arguments"] = (min_watts, max_watts, pue, memory_coefficient, optimal)
+
+
+def explore_workflow_in_worker(workflow):
+    (min_watts, max_watts, pue, memory_coefficient, optimal) = worker_state["arguments"]
+    return explore_workflow(workflow, worker_state["ci"], min_watts, max_watts, pue, memory_coefficient, optimal, worker_state["ci_index"])
+
+
+def explore_workflows_in_pool(workflows, ci, min_watts, max_watts, pue, memory_coefficient, optimal, workers):
+    # a series is copied once into shared memory for all workers, any other ci is sent to each worker once
+    memory = None
+    shared_ci = None
+
+    try:
+        if isinstance(ci, CarbonIntensitySeries):
+            values = ci.get_values()
+            memory = SharedMemory(create=True, size=max(values.nbytes, 1))
+            np.ndarray(len(values), dtype=np.float64, buffer=memory.buf)[:] = values
+            shared_ci = (memory.name, ci.get_start(), ci.get_step(), len(values))
+            ci = None
+
+        initargs = (ci, shared_ci, min_watts, max_watts, pue, memory_coefficient, optimal)
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=initargs) as pool:
+            return list(pool.map(explore_workflow_in_worker, workflows))  # results keep the order of workflows
+    finally:
+        if memory is not None:
+            memory.close()
+            memory.unlink()
+
+
+def get_workflows(traces):
+    # a manifest file lists one workflow per line, otherwise traces is a glob of trace files in data/trace
+    if os.path.isfile(traces):
+        with open(traces, 'r') as file:
+            return [line.strip() for line in file if len(line.strip()) > 0 and not line.startswith('#')]
+
+    files = sorted(glob(os.path.join("data/trace", traces)))
+    return [os.path.splitext(os.path.basename(file))[0] for file in files if file.endswith(f".{FILE}")]
+
+
+def main(workflows, ci, min_watts, max_watts, pue, memory_coefficient, optimal=False, workers=1):
+    output_file = 'output/workflows-temp-shift-interrupt-optimal.csv' if optimal else 'output/workflows-temp-shift-interrupt.csv'
+
+    if workers > 1 and len(workflows) > 1:
+        results = explore_workflows_in_pool(workflows, ci, min_watts, max_watts, pue, memory_coefficient, optimal, min(workers, len(workflows)))
+    else:
+        ci_index = make_ci_index(ci)
+        results = [explore_workflow(workflow, ci, min_watts, max_watts, pue, memory_coefficient, optimal, ci_index) for workflow in workflows]
+
+    with open(output_file, 'w') as f:
         f.write('workflow,footprint,flexible-6h,flexible-12h,flexible-24h,flexible-48h,flexible-96h\n')
 
         for result in results:
@@ -352,6 +447,10 @@ def main(workflows, ci, min_watts, max_watts, pue, memory_coefficient):
 if __name__ == '__main__':
     # Parse Arguments
     arguments = sys.argv[1:]
+    optimal = OPTIMAL_FLAG in arguments
+    traces = [argument[len(TRACES_FLAG):] for argument in arguments if argument.startswith(TRACES_FLAG)]
+    workers = [int(argument[len(WORKERS_FLAG):]) for argument in arguments if argument.startswith(WORKERS_FLAG)]
+    arguments = [argument for argument in arguments if argument != OPTIMAL_FLAG and not argument.startswith((TRACES_FLAG, WORKERS_FLAG))]
 
     if len(arguments) != 5:
         print_usage_exit()
@@ -362,6 +461,9 @@ if __name__ == '__main__':
     memory_coefficient = float(arguments[2])
     min_watts = int(arguments[3])
     max_watts = int(arguments[4])
-    ci = parse_ci_intervals(ci_filename)
+    ci = parse_ci_series(ci_filename)
+
+    workflows = get_workflows(traces[-1]) if len(traces) > 0 else WORKFLOWS_M
+    workers = workers[-1] if len(workers) > 0 else 1  # workflows are explored in this process unless --workers is given
 
-    main(WORKFLOWS_M, ci, min_watts, max_watts, pue, memory_coefficient)
+    main(workflows, ci, min_watts, max_watts, pue, memory_coefficient, optimal, workers)